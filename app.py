@@ -1,13 +1,30 @@
 import streamlit as st
-import pandas as pd
+import csv
 import io
+import time
 from datetime import datetime
-import plotly.graph_objects as go
+from qcm import metrics
+from qcm.bootstrap import frame_intervals, segment_intervals
+from qcm.charts import heatmap_chart, history_chart, radar_chart
+from qcm.export import MIME, has_parquet, spooled_export, store_chunks
+from qcm.history import History
+from qcm.identity import AliasMap, find_duplicates, identities_from_frame
+from qcm.legacy import import_legacy
+from qcm.multichoice import MASK_SUFFIX, cooccurrence, share_by
+from qcm.options import MULTI_FIELDS, OPTIONS
+from qcm.planner import plan_improvements
+from qcm.render import RenderCache, RenderStats, subs_key
+from qcm.rollup import ALL, MIN_PEERS, SEGMENT_COLUMNS, Rollup
+from qcm.rubric import CURRENT_RUBRIC, LEGACY_RUBRIC, VERSION_COLUMN
+from qcm.scoring import ANSWER_COLUMNS, DOMAINS_ORDER, compute_form_progress, compute_indicators, missing_required, recommandations, result_row as build_result_row
+from qcm.storage import open_store, ResultsCache, LEGACY_XLSX
 
 # =========================
 # CONFIG & THEME
 # =========================
 st.set_page_config(page_title="Test d'auto-positionnement APS", page_icon="✅", layout="wide")
+rerun_t0 = time.perf_counter()  # durée du rerun (qcm.metrics, si activé)
+metrics.start_flusher()
 
 # ---- CSS / Charte graphique
 st.markdown("""
@@ -20,12 +37,12 @@ body{ background: radial-gradient(1200px 800px at 10% 10%, #eef4ff 0%, #f6fbf8 4
 .block-container{ padding-top:1.2rem; padding-bottom:2rem; }
 h1,h2,h3{ color:var(--text); font-weight:700; }
 hr{opacity:.1;}
-.stButton>button{
+.stButton>button, .stFormSubmitButton>button{
   background: linear-gradient(90deg, var(--prim), var(--sec));
   color:#fff;border:none;border-radius:12px;padding:.7em 1.4em;font-size:1rem;
   box-shadow:0 6px 18px rgba(47,128,237,.25); transition:.25s;
 }
-.stButton>button:hover{ transform:translateY(-1px) scale(1.02); }
+.stButton>button:hover, .stFormSubmitButton>button:hover{ transform:translateY(-1px) scale(1.02); }
 .card{
   background:var(--card); border-radius:16px; padding:16px 18px; box-shadow:0 4px 18px rgba(0,0,0,.06); margin:10px 0;
 }
@@ -52,485 +69,497 @@ hr{opacity:.1;}
 # HELPERS / BARÈME
 # =========================
 
-# Barème par domaines (pondérations qui totalisent 100)
-WEIGHTS = {
-    "Referent": 20,           # référent + formation + organisme
-    "Regulier": 25,           # existence + part usagers + durée + variété
-    "Occasionnel": 10,        # existence
-    "Encadrement": 15,        # profils pro
-    "Projet": 10,             # inscrit au projet
-    "Liens": 10,              # partenaires
-    "Qualite": 10             # objectifs, satisfaction perçue
-}
-DOMAINS_ORDER = ["Referent", "Regulier", "Occasionnel", "Encadrement", "Projet", "Liens", "Qualite"]
-
-def scale(value, mini, maxi):
-    if value <= mini: return 0.0
-    if value >= maxi: return 1.0
-    return (value-mini)/(maxi-mini)
-
 def color_for_score(s):
     if s < 40: return "var(--err)"
     if s < 70: return "var(--warn)"
     return "var(--sec)"
 
-def pct_to_float(pct_label):
-    # "30-40%" -> 0.35 ; "90-100%" -> 0.95
-    num = pct_label.split("%")[0]         # "30-40"
-    a,b = num.split("-")
-    return (float(a)+float(b))/200.0
-
-def duree_to_minutes(label):
-    m = {"0 min":0,"20 min":20,"30 min":30,"45 min":45,"1h":60,"1h30":90,"2h":120,"2h30":150}
-    return m.get(label,0)
-
-def compute_indicators(data):
-    """Calcule les sous-indicateurs [0..100] par domaine puis l'indicateur global (pondéré)."""
-    subs = {}
-
-    # --- Référent (20)
-    sub_ref = 0
-    if data["referent"] == "Oui": sub_ref += 0.6
-    if data["formation_referent"] == "Oui": sub_ref += 0.25
-    if data["organisme"] != "Aucun / Non précisé": sub_ref += 0.15
-    subs["Referent"] = round(sub_ref*100,1)
-
-    # --- Régulier (25)
-    sub_reg = 0
-    if data["activite_reguliere"] != "Non":
-        sub_reg += 0.35
-        # part d'usagers : cible >= 50%
-        part = pct_to_float(data["nb_usagers"])  # 0..1
-        sub_reg += 0.35 * scale(part, 0.10, 0.70)
-        # durée hebdo : cible >= 90 min
-        minutes = duree_to_minutes(data["duree"])
-        sub_reg += 0.20 * scale(minutes, 30, 90)
-        # diversité : au moins 2 types → meilleur
-        diversite = len(data["types_activites"])
-        sub_reg += 0.10 * min(diversite/3, 1.0)
-    else:
-        sub_reg = 0
-    subs["Regulier"] = round(sub_reg*100,1)
-
-    # --- Occasionnel (10)
-    sub_occ = 1.0 if data["occasionnelle"] == "Oui" else 0.0
-    subs["Occasionnel"] = round(sub_occ*100,1)
-
-    # --- Encadrement (15)
-    # 1 pro = bien, 2 profils = mieux
-    enc = data["encadrants"]
-    if "Aucun professionnel" in enc or len(enc)==0:
-        sub_enc = 0
-    else:
-        base = 0.6
-        bonus = 0.4 * min(len(enc)/2,1.0)
-        sub_enc = base + bonus
-    subs["Encadrement"] = round(sub_enc*100,1)
-
-    # --- Projet (10)
-    subs["Projet"] = 100.0 if data["projet_etab"]=="Oui" else 0.0
-
-    # --- Liens (10)
-    liens = data["liens"]
-    if "Aucun" in liens or len(liens)==0:
-        sub_liens = 0
-    else:
-        sub_liens = min(len(liens)/3,1.0)
-    subs["Liens"] = round(sub_liens*100,1)
-
-    # --- Qualité/intentions (10)
-    # objectifs : plus il y en a (pertinents), mieux c'est (max 5)
-    obj = len(data["objectifs"])
-    sat = data["satisfaction"]
-    plus = "Vouloir plus d’APS" in sat
-    pas_satisfaits = "Ne pas être satisfaits" in sat
-    # base sur objectifs
-    s_obj = min(obj/5, 1.0) * 0.7
-    # perception : pénalité si insatisfaction
-    pen = 0.0
-    if pas_satisfaits: pen += 0.25
-    if plus: pen += 0.15
-    sub_q = max(0.0, (s_obj - pen) + 0.45)  # petite base positive pour ne pas écraser
-    sub_q = min(1.0, sub_q)
-    subs["Qualite"] = round(sub_q*100,1)
-
-    # ---- Indicateur global pondéré
-    total = 0.0
-    for d,w in WEIGHTS.items():
-        total += (subs[d]/100.0) * w
-    global_indic = round(total,1)
-
-    return subs, global_indic
-
-def recommandations(subs):
-    """Conseils par domaine selon sous-indicateurs."""
-    recos = []
-
-    def reco_for(domain, msg_low, msg_mid, msg_high):
-        s = subs[domain]
-        if s < 40: recos.append(f"🔴 **{domain}** — {msg_low}")
-        elif s < 70: recos.append(f"🟠 **{domain}** — {msg_mid}")
-        else: recos.append(f"🟢 **{domain}** — {msg_high}")
-
-    reco_for("Referent",
-             "Désigner un(e) référent(e) APS et prévoir une formation reconnue (LSAHF, Handisport, Université…).",
-             "Formaliser le rôle du référent et compléter/parfaire la formation.",
-             "Maintenir la dynamique (veille, mise à jour des compétences).")
-
-    reco_for("Regulier",
-             "Mettre en place des APS **hebdomadaires**, viser ≥ 50% des usagers et ≥ 90 min/sem, diversifier les pratiques.",
-             "Augmenter progressivement la **part d’usagers** et la **durée** (objectif 90 min/sem), varier 2–3 types d’APS.",
-             "Consolider les volumes et la diversité, formaliser la programmation annuelle.")
-
-    reco_for("Occasionnel",
-             "Introduire des temps **occasionnels** (sorties, événements, cycles courts) pour engager les publics.",
-             "Régulariser la fréquence (ex. mensuelle) et anticiper le calendrier.",
-             "Pérenniser un calendrier d’événements et mutualiser avec d’autres ESMS.")
-
-    reco_for("Encadrement",
-             "Mobiliser des **professionnels** (APA, éducateur sportif) et clarifier l’encadrement.",
-             "Augmenter les créneaux encadrés et favoriser la co-intervention (APA + éducateur).",
-             "Capitaliser (tutorat interne, partage de séances, transmission).")
-
-    reco_for("Projet",
-             "Inscrire les APS dans le **projet d’établissement/CPOM** avec objectifs, indicateurs, moyens.",
-             "Mieux formaliser dans le projet (indicateurs, calendrier, moyens).",
-             "Suivre des indicateurs annuels et communiquer aux équipes/financeurs.")
-
-    reco_for("Liens",
-             "Créer des liens avec clubs (adapté/ordinaire), ligues, MSS, communes pour l’accès aux créneaux.",
-             "Élargir et contractualiser (convention, accès infrastructures, co-organisation).",
-             "Structurer un réseau de partenaires et un planning partagé.")
-
-    reco_for("Qualite",
-             "Clarifier les **objectifs** (autonomie, bien-être, habiletés…) et travailler l’adhésion des usagers.",
-             "Mieux relier objectifs ↔ séances et recueillir le **ressenti** des usagers.",
-             "Poursuivre l’évaluation qualitative et la co-construction avec les usagers.")
-
-    return recos
-
-def radar_chart(subs, title="Toile d’araignée – Indicateurs par domaine"):
-    cats = DOMAINS_ORDER
-    vals = [subs[c] for c in cats]
-    vals.append(vals[0])  # fermeture du polygone
-    cats_loop = cats + [cats[0]]
-    fig = go.Figure()
-    fig.add_trace(go.Scatterpolar(r=vals, theta=cats_loop, fill='toself', name='Indicateur domaine'))
-    fig.update_layout(
-        title=title,
-        polar=dict(
-            radialaxis=dict(visible=True, range=[0,100], tickvals=[0,20,40,60,80,100])
-        ),
-        showlegend=True,
-        height=430,
-        margin=dict(l=20,r=20,t=60,b=20)
-    )
-    return fig
-
-# --- Nouveau : calcul de progression de formulaire (pour la barre en haut)
-def compute_form_progress(nom, nb_places, referent, formation_referent, activite_reguliere, nb_usagers, duree, encadrants, projet_etab, occasionnelle):
-    required_total = 0
-    done = 0
-    # On aligne la logique sur la validation plus bas (mêmes champs requis)
-    checks = [
-        ("Nom de l’établissement", bool(nom)),
-        ("Nombre de places", (nb_places is not None and nb_places != 0)),
-        ("Référent APS", referent is not None),
-        ("Formation spécifique", formation_referent is not None),
-        ("APS régulières", activite_reguliere is not None),
-        ("Part d’usagers concernés", nb_usagers is not None),
-        ("Durée hebdo moyenne", duree is not None),
-        ("Encadrement", len(encadrants) > 0),
-        ("Projet d’établissement", projet_etab is not None),
-        ("APS occasionnelles", occasionnelle is not None),
-    ]
-    required_total = len(checks)
-    done = sum(1 for _, ok in checks if ok)
-    pct = int(round((done/required_total)*100)) if required_total>0 else 0
-    return pct, done, required_total
+@st.cache_resource
+def get_render_cache():
+    # figures et fragments HTML partagés entre reruns et sessions (LRU)
+    return RenderCache(maxsize=512)
 
-# =========================
-# SIDEBAR (mode)
-# =========================
-st.sidebar.title("⚙️ Navigation")
-mode = st.sidebar.radio("Choisir une page :", ["📝 Questionnaire", "📊 Admin (résultats globaux)"])
-st.sidebar.markdown("---")
-if st.sidebar.button("♻️ Réinitialiser les réponses", help="Efface les sélections et recharge la page", use_container_width=True):
-    st.rerun()
+render_stats = RenderStats()  # compteurs du rerun courant
 
-# =========================
-# PAGE: QUESTIONNAIRE
-# =========================
-if mode.startswith("📝"):
-    st.markdown("<div class='card kpi'>"
-                "<div class='section-title'><span class='emoji'>🧭</span><h2>Test d'auto-positionnement APS en ESMS</h2></div>"
-                "<div class='small'>Les champs marqués <span class='req'>[obligatoire]</span> sont des indicateurs requis. "
-                "Les autres sont <span class='opt'>optionnels</span>.</div>"
-                "</div>", unsafe_allow_html=True)
+@st.cache_resource
+def get_ci_cache():
+    # intervalles bootstrap par combinaison de filtres (clé : filtres + version du store)
+    return RenderCache(maxsize=64)
+
+def cached_radar(subs, title):
+    # figure réutilisée telle quelle (ne pas la modifier après coup)
+    return get_render_cache().get(("radar", subs_key(subs), title), lambda: radar_chart(subs, title), render_stats)
+
+def cached_html(kind, key, build):
+    return get_render_cache().get((kind, key), build, render_stats)
+
+def kpi_cards_html(subs, indicateur_global):
+    return (
+        f"<div class='card kpi'><h3>📈 Indicateur global</h3><h2 style='color:{color_for_score(indicateur_global)}'>{indicateur_global}/100</h2></div>",
+        f"<div class='card kpi'><h3>🎯 Domaines ≥ 70</h3><h2>{sum(1 for v in subs.values() if v>=70)}/{len(subs)}</h2></div>",
+        f"<div class='card kpi'><h3>🛠️ Domaines < 40</h3><h2>{sum(1 for v in subs.values() if v<40)}</h2></div>",
+    )
+
+def score_bar_html(indicateur_global):
+    bar_color = color_for_score(indicateur_global)
+    return f"""
+            <div class='card'>
+              <div class='small'><span class='legend-dot' style='background:{bar_color}'></span>Légende : rouge &lt; 40, orange 40–69, vert ≥ 70</div>
+              <div class='progress-wrap'>
+                <div class='progress-bar' style='width:{indicateur_global}%; background:{bar_color};'>{indicateur_global}%</div>
+              </div>
+            </div>
+            """
+
+def domain_cards_html(subs):
+    return "".join(f"<div class='card'><b>{d}</b> — <span style='color:{color_for_score(subs[d])}'><b>{subs[d]}/100</b></span></div>" for d in DOMAINS_ORDER)
+
+def peers_html(peers):
+    segment = ", ".join(v for v in peers["segment"] if v != ALL) or "tous les établissements"
+    def line(label, r):
+        return (f"<div><b>{label}</b> — percentile <b>{r['percentile']:.0f}</b> "
+                f"<span class='small'>({r['position']}ᵉ sur {r['peers']})</span></div>")
+    g = peers["ranks"].get("Indicateur_global")
+    rows = [line("Indicateur global", g)] if g else []
+    rows += [line(d, peers["ranks"][f"Indic_{d}"]) for d in DOMAINS_ORDER if f"Indic_{d}" in peers["ranks"]]
+    note = "" if peers["peers"] >= MIN_PEERS else " — effectif faible, à interpréter avec prudence"
+    return (f"<div class='card'><div class='small'>Comparaison : {segment} "
+            f"(<b>{peers['peers']}</b> établissement(s), votre réponse incluse){note}</div>" + "".join(rows) + "</div>")
+
+def change_html(delta):
+    def fmt(v):
+        if v is None:
+            return "<span class='small'>n.c.</span>"
+        color = "var(--leaf)" if v > 0 else "var(--err)" if v < 0 else "var(--muted)"
+        return f"<b style='color:{color}'>{v:+.1f}</b>"
+    items = [("Indicateur global", delta["Indicateur_global"])] + [(d, delta[f"Indic_{d}"]) for d in DOMAINS_ORDER]
+    return "<div class='card'>" + " · ".join(f"{label} {fmt(v)}" for label, v in items) + "</div>"
+
+def row_csv(row):
+    # CSV individuel (une ligne) sans charger pandas
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=list(row), lineterminator="\n")
+    w.writeheader()
+    w.writerow(row)
+    return buf.getvalue().encode("utf-8")
+
+# --- Réponses du questionnaire : widgets à clé "q_*" (session_state)
+def reset_answers():
+    # callback : les widgets reprennent leur valeur par défaut au rerun
+    for k in [k for k in st.session_state if k.startswith("q_")]:
+        del st.session_state[k]
+    st.session_state.pop("qcm_result", None)
+
+@st.fragment
+def required_sections():
+    # fragment : chaque saisie ne relance que ces sections et la barre de progression
+    progress_slot = st.empty()
 
     # ---------- SECTION: Informations ----------
     st.markdown("<div class='section-title'><span class='emoji'>ℹ️</span><h3>Informations établissement</h3></div>", unsafe_allow_html=True)
     colA,colB,colC = st.columns(3)
     with colA:
-        nom = st.text_input("Nom de l’établissement * [obligatoire]", placeholder="ex: ESMS Les Genêts")
-        departement = st.selectbox("Département * [obligatoire]", ["02 - Aisne","59 - Nord","60 - Oise","62 - Pas-de-Calais","80 - Somme"])
+        nom = st.text_input("Nom de l’établissement * [obligatoire]", placeholder="ex: ESMS Les Genêts", key="q_nom")
+        st.selectbox("Département * [obligatoire]", OPTIONS["departement"], key="q_departement")
     with colB:
-        type_etab = st.selectbox("Votre établissement est * [obligatoire]", ["ESAT","IME","ITEP","FAM","MAS","SAMSAH","SESSAD","EEAP","IEM","Autre"])
-        nb_places = st.number_input("Nombre de places autorisées * [obligatoire]", min_value=0, step=1)
+        st.selectbox("Votre établissement est * [obligatoire]", OPTIONS["type_etab"], key="q_type_etab")
+        nb_places = st.number_input("Nombre de places autorisées * [obligatoire]", min_value=0, step=1, key="q_nb_places")
     with colC:
-        tranche_age = st.selectbox("Tranche d'âge du public accueilli * [obligatoire]", ["Enfants","Adultes","Mixte"])
-        public = st.multiselect("Public accueilli * [obligatoire]", ["Enfant","Adulte"], default=["Enfant","Adulte"])
-    handicaps = st.multiselect("Types de handicap (optionnel)", ["Déficience intellectuelle","Handicap psychique","Troubles du neurodéveloppement","Polyhandicap","Autre"])
-
-    # ---------- Barre de progression de complétion (nouvelle)
-    # On calcule avec les valeurs déjà saisies (certaines ont une valeur par défaut donnée par Streamlit)
-    _tmp_referent_default = "Oui"  # placeholders logiques pour éviter None si Streamlit a déjà une valeur
-    _tmp_formation_default = "Oui"
-    _tmp_reg_default = "Non"
-    _tmp_nb_usagers_default = "0-10%"
-    _tmp_duree_default = "0 min"
-    _tmp_encadrants_default = []
-    _tmp_projet_default = "Non"
-    _tmp_occ_default = "Non"
-
-    # Initialisation temporaire avant que l'utilisateur ne fasse ses choix (sera réévaluée plus bas)
-    form_pct, form_done, form_total = compute_form_progress(
-        nom or "", nb_places, _tmp_referent_default, _tmp_formation_default, _tmp_reg_default,
-        _tmp_nb_usagers_default, _tmp_duree_default, _tmp_encadrants_default, _tmp_projet_default, _tmp_occ_default
-    )
-    # Affichage visuel de la progression
-    st.markdown(f"""
-    <div class='card'>
-      <div class='section-title'><span class='emoji'>📶</span><h3>Progression du questionnaire</h3></div>
-      <div class='small'>Complété : <b>{form_done}/{form_total}</b> — avancez jusqu'à 100% pour des indicateurs au plus juste.</div>
-      <div class='progress-wrap' style='height:22px;'>
-        <div class='progress-bar-alt' style='width:{form_pct}%;'>{form_pct}%</div>
-      </div>
-    </div>
-    """, unsafe_allow_html=True)
+        st.selectbox("Tranche d'âge du public accueilli * [obligatoire]", OPTIONS["tranche_age"], key="q_tranche_age")
+        st.multiselect("Public accueilli * [obligatoire]", OPTIONS["public"], default=OPTIONS["public"], key="q_public")
+    st.multiselect("Types de handicap (optionnel)", OPTIONS["handicaps"], key="q_handicaps")
 
     # ---------- SECTION: Référent ----------
     st.markdown("<div class='section-title'><span class='emoji'>👤</span><h3>Référent APS</h3></div>", unsafe_allow_html=True)
     col1,col2,col3 = st.columns(3)
-    referent = col1.radio("Référent APS identifié ? [obligatoire]", ["Oui","Non"], horizontal=True)
-    formation_referent = col2.radio("Formation spécifique ? [obligatoire]", ["Oui","Non"], horizontal=True)
-    organisme = col3.selectbox("Organisme de formation", ["Aucun / Non précisé","LSAHF","Fédération Handisport","Université (APAS)","ARS / DRJSCS","Autre"])
+    referent = col1.radio("Référent APS identifié ? [obligatoire]", OPTIONS["referent"], horizontal=True, key="q_referent")
+    formation_referent = col2.radio("Formation spécifique ? [obligatoire]", OPTIONS["formation_referent"], horizontal=True, key="q_formation_referent")
+    col3.selectbox("Organisme de formation", OPTIONS["organisme"], key="q_organisme")
 
     # ---------- SECTION: Activités régulières ----------
     st.markdown("<div class='section-title'><span class='emoji'>🏃</span><h3>Activités physiques régulières</h3></div>", unsafe_allow_html=True)
-    activite_reguliere = st.radio("APS régulières ? [obligatoire]", ["Non","Oui, 1 fois par semaine","Oui, plus d'une fois"], horizontal=True)
+    activite_reguliere = st.radio("APS régulières ? [obligatoire]", OPTIONS["activite_reguliere"], horizontal=True, key="q_activite_reguliere")
     colr1,colr2,colr3,colr4 = st.columns(4)
     nb_usagers = colr1.selectbox("Part d’usagers concernés [obligatoire]",
-                                 ["0-10%","10-20%","20-30%","30-40%","40-50%","50-60%","60-70%","70-80%","80-90%","90-100%"])
+                                 OPTIONS["nb_usagers"], key="q_nb_usagers")
     duree = colr2.selectbox("Durée hebdo moyenne [obligatoire]",
-                            ["0 min","20 min","30 min","45 min","1h","1h30","2h","2h30"])
-    types_activites = colr3.multiselect("Types proposés (au moins 1 recommandé)", ["Individuelle","Collective","Opposition","Artistique","Pleine nature"])
-    freq_label = colr4.selectbox("Fréquence", ["Non précisé","Hebdomadaire","Bi-hebdomadaire","Quotidien"])
+                            OPTIONS["duree"], key="q_duree")
+    colr3.multiselect("Types proposés (au moins 1 recommandé)", OPTIONS["types_activites"], key="q_types_activites")
+    colr4.selectbox("Fréquence", OPTIONS["freq_label"], key="q_freq_label")
 
     # ---------- SECTION: Activités occasionnelles ----------
     st.markdown("<div class='section-title'><span class='emoji'>🎉</span><h3>Activités occasionnelles</h3></div>", unsafe_allow_html=True)
-    occasionnelle = st.radio("APS occasionnelles ? [obligatoire]", ["Oui","Non"], horizontal=True)
-
-    # ---------- SECTION: Objectifs / Qualité ----------
-    st.markdown("<div class='section-title'><span class='emoji'>🎯</span><h3>Objectifs & perception</h3></div>", unsafe_allow_html=True)
-    objectifs = st.multiselect("Objectifs poursuivis", ["Thérapeutique","Occupationnel","Maintien des capacités physiques","Développement physique","Habiletés sociales","Capacités cognitives","Autonomie","Bien-être"])
-    satisfaction = st.multiselect("Les usagers verbalisent (perception)", ["Vouloir plus d’APS","Être satisfaits","Ne pas être satisfaits","Trop d’APS"])
+    occasionnelle = st.radio("APS occasionnelles ? [obligatoire]", OPTIONS["occasionnelle"], horizontal=True, key="q_occasionnelle")
 
     # ---------- SECTION: Encadrement & Infrastructures ----------
     st.markdown("<div class='section-title'><span class='emoji'>👨‍🏫</span><h3>Encadrement & infrastructures</h3></div>", unsafe_allow_html=True)
-    encadrants = st.multiselect("Professionnels encadrants [obligatoire]", ["Enseignant APA","Éducateur sportif","Aucun professionnel"])
-    infrastructures = st.multiselect("Lieux de pratique (optionnel)", ["Gymnase interne","Salle polyvalente","Espace extérieur","À l’extérieur","Non concerné"])
-
-    # ---------- SECTION: Projet & Liens ----------
-    cols = st.columns(2)
-    with cols[0]:
-        st.markdown("<div class='section-title'><span class='emoji'>📑</span><h3>Projet d’établissement</h3></div>", unsafe_allow_html=True)
-        projet_etab = st.radio("APS inscrites au projet/CPOM ? [obligatoire]", ["Oui","Non"], horizontal=True)
-    with cols[1]:
-        st.markdown("<div class='section-title'><span class='emoji'>🌍</span><h3>Liens extérieurs</h3></div>", unsafe_allow_html=True)
-        liens = st.multiselect("Structures partenaires", ["Clubs adaptés","Clubs ordinaires","Mairie","Ligues","Maisons sport-santé","Autres ESMS","Aucun"])
+    encadrants = st.multiselect("Professionnels encadrants [obligatoire]", OPTIONS["encadrants"], key="q_encadrants")
+    st.multiselect("Lieux de pratique (optionnel)", OPTIONS["infrastructures"], key="q_infrastructures")
 
-    # ---------- SECTION: Leviers & Freins (optionnels pour l’analyse)
-    st.markdown("<div class='section-title'><span class='emoji'>⚖️</span><h3>Leviers & freins (optionnel)</h3></div>", unsafe_allow_html=True)
-    actions_existantes = st.multiselect("Actions déjà mises en place", ["Recrutement","Achat matériel","Création de séances","Lieu dédié","Sorties","Partenariat clubs"])
-    freins = st.multiselect("Freins rencontrés", ["Moyens humains","Moyens matériels","Lieu","Manque de contacts","Absence clubs","Temps","Manque info"])
+    # ---------- SECTION: Projet ----------
+    st.markdown("<div class='section-title'><span class='emoji'>📑</span><h3>Projet d’établissement</h3></div>", unsafe_allow_html=True)
+    projet_etab = st.radio("APS inscrites au projet/CPOM ? [obligatoire]", OPTIONS["projet_etab"], horizontal=True, key="q_projet_etab")
 
-    st.markdown("---")
-
-    # ---------- Boutons
-    c1,c2,c3 = st.columns([1,1,2])
-    with c1:
-        ready = st.button("✅ Calculer mes indicateurs", use_container_width=True)
-    with c2:
-        if st.button("♻️ Reset", help="Effacer toutes les réponses", use_container_width=True):
-            st.rerun()
-
-
-    # --- Mettre à jour la barre de progression avec les vraies réponses (après l’affichage des champs)
+    # Affichage visuel de la progression (en haut des sections, via le placeholder)
     form_pct, form_done, form_total = compute_form_progress(
         nom, nb_places, referent, formation_referent, activite_reguliere, nb_usagers, duree, encadrants, projet_etab, occasionnelle
     )
-    st.markdown(f"""
+    progress_slot.markdown(f"""
     <div class='card'>
-      <div class='small'><span class='badge'>Progression du QCM mise à jour</span> : <b>{form_done}/{form_total}</b></div>
-      <div class='progress-wrap' style='height:18px;'>
-        <div class='progress-bar-alt' style='width:{form_pct}%; height:18px;'>{form_pct}%</div>
+      <div class='section-title'><span class='emoji'>📶</span><h3>Progression du questionnaire</h3></div>
+      <div class='small'>Complété : <b>{form_done}/{form_total}</b> — avancez jusqu'à 100% pour des indicateurs au plus juste.</div>
+      <div class='progress-wrap' style='height:22px;'>
+        <div class='progress-bar-alt' style='width:{form_pct}%;'>{form_pct}%</div>
       </div>
     </div>
     """, unsafe_allow_html=True)
 
+@st.fragment
+def show_results(res):
+    # fragment : le téléchargement ne relance que la zone des résultats
+    subs, indicateur_global = res["subs"], res["indicateur_global"]
+    # les saisies suivantes ne relancent pas cette zone : résultats datés de leur calcul
+    st.caption(f"Résultats calculés le {res['horodatage'].replace('T', ' à ')} — après modification des réponses, "
+               "cliquez à nouveau sur « Calculer mes indicateurs ».")
+
+    # ---- Affichage KPI
+    st.markdown("<hr/>", unsafe_allow_html=True)
+    k1, k2, k3 = st.columns(3)
+    kpi_html = cached_html("kpi", (subs_key(subs), indicateur_global), lambda: kpi_cards_html(subs, indicateur_global))
+    for col, html in zip((k1, k2, k3), kpi_html):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
+
+    # ---- Barre progression (indicateur global, déjà présente)
+    st.markdown(cached_html("score_bar", indicateur_global, lambda: score_bar_html(indicateur_global)), unsafe_allow_html=True)
+
+    # ---- Radar
+    fig = cached_radar(subs, "Toile d’araignée – Indicateurs par domaine (0–100)")
+    st.plotly_chart(fig, use_container_width=True)
+
+    # ---- Détails par domaine
+    st.markdown("### 🔎 Détail des indicateurs par domaine")
+    st.markdown(cached_html("domains", subs_key(subs), lambda: domain_cards_html(subs)), unsafe_allow_html=True)
+
+    # ---- Position parmi les pairs (même Département / Type / Tranche d'âge)
+    if res.get("peers"):
+        st.markdown("### 🏅 Position parmi les établissements comparables")
+        st.markdown(peers_html(res["peers"]), unsafe_allow_html=True)
+
+    # ---- Évolution depuis la soumission précédente du même établissement
+    if res.get("change"):
+        since, delta = res["change"]
+        st.markdown(f"### 📈 Évolution depuis votre dernière soumission ({since})")
+        st.markdown(change_html(delta), unsafe_allow_html=True)
+
+    # ---- Pistes d'amélioration : réponses à changer qui rapportent le plus
+    if res.get("plan"):
+        st.markdown("### 🧭 Pistes d’amélioration")
+        for p in res["plan"]:
+            st.markdown(f"- **+{p['gain']:.1f} pts** — " + " ; ".join(p["labels"]))
+
+    # ---- Conseils & accompagnement
+    st.markdown("### 🤝 Messages d’accompagnement et conseils")
+    for line in recommandations(subs):
+        st.markdown(f"- {line}")
+
+    # Bouton téléchargement (CSV individuel)
+    st.download_button("⬇️ Télécharger mes résultats (CSV)", data=res["csv"], file_name=f"resultats_{res['nom'].replace(' ','_')}.csv", mime="text/csv", help="Export des indicateurs et réponses")
+
+    st.markdown("<div class='download-note'>Les résultats cumulés sont également enregistrés (page Admin, export Excel à la demande).</div>", unsafe_allow_html=True)
+
+# --- Stockage des résultats (partagé entre sessions, ajout seul)
+@st.cache_resource
+def get_results_store():
+    store = open_store()
+    # reprise unique de l'ancien fichier Excel cumulatif
+    if store.is_empty():
+        try:
+            store.import_xlsx(LEGACY_XLSX)
+        except FileNotFoundError:
+            pass
+    return store
+
+@st.cache_resource(max_entries=1)
+def get_results_cache():
+    # partagé entre sessions : chaque rerun Admin ne lit que les nouvelles lignes
+    return ResultsCache(get_results_store(), max_rows=200_000, typed=True)
+
+@st.cache_resource(max_entries=1)
+def get_rollup():
+    # agrégats par segment, mis à jour à chaque nouvelle soumission
+    return Rollup(get_results_store())
+
+@st.cache_resource(max_entries=1)
+def get_history():
+    # soumissions indexées par établissement (nom normalisé)
+    return History(get_results_store())
+
+@st.cache_resource(max_entries=1)
+def get_aliases():
+    # fusions de doublons acceptées (fichier JSON à côté du store)
+    return AliasMap.for_store(get_results_store())
+
+# =========================
+# SIDEBAR (mode)
+# =========================
+st.sidebar.title("⚙️ Navigation")
+mode = st.sidebar.radio("Choisir une page :", ["📝 Questionnaire", "📊 Admin (résultats globaux)"])
+st.sidebar.markdown("---")
+st.sidebar.button("♻️ Réinitialiser les réponses", help="Efface les sélections et recharge la page", on_click=reset_answers, use_container_width=True)
+
+# =========================
+# PAGE: QUESTIONNAIRE
+# =========================
+if mode.startswith("📝"):
+    st.markdown("<div class='card kpi'>"
+                "<div class='section-title'><span class='emoji'>🧭</span><h2>Test d'auto-positionnement APS en ESMS</h2></div>"
+                "<div class='small'>Les champs marqués <span class='req'>[obligatoire]</span> sont des indicateurs requis. "
+                "Les autres sont <span class='opt'>optionnels</span>.</div>"
+                "</div>", unsafe_allow_html=True)
+
+    # Champs obligatoires et progression : fragment, seule cette zone est relancée à chaque saisie
+    required_sections()
+
+    # Champs facultatifs : formulaire, les saisies ne relancent rien jusqu'au calcul
+    with st.form("questionnaire", border=False):
+        # ---------- SECTION: Objectifs / Qualité ----------
+        st.markdown("<div class='section-title'><span class='emoji'>🎯</span><h3>Objectifs & perception</h3></div>", unsafe_allow_html=True)
+        st.multiselect("Objectifs poursuivis", OPTIONS["objectifs"], key="q_objectifs")
+        st.multiselect("Les usagers verbalisent (perception)", OPTIONS["satisfaction"], key="q_satisfaction")
+
+        # ---------- SECTION: Liens ----------
+        st.markdown("<div class='section-title'><span class='emoji'>🌍</span><h3>Liens extérieurs</h3></div>", unsafe_allow_html=True)
+        st.multiselect("Structures partenaires", OPTIONS["liens"], key="q_liens")
+
+        # ---------- SECTION: Leviers & Freins (optionnels pour l’analyse)
+        st.markdown("<div class='section-title'><span class='emoji'>⚖️</span><h3>Leviers & freins (optionnel)</h3></div>", unsafe_allow_html=True)
+        st.multiselect("Actions déjà mises en place", OPTIONS["actions_existantes"], key="q_actions_existantes")
+        st.multiselect("Freins rencontrés", OPTIONS["freins"], key="q_freins")
+
+        st.markdown("---")
+        ready = st.form_submit_button("✅ Calculer mes indicateurs", use_container_width=True)
+    st.button("♻️ Reset", help="Effacer toutes les réponses", on_click=reset_answers)
+
+    # Pack des réponses (valeurs des widgets, en session)
+    answers = {k: st.session_state[f"q_{k}"] for k in ANSWER_COLUMNS}
+    nom, departement, type_etab, tranche_age = (answers[k] for k in ("nom", "departement", "type_etab", "tranche_age"))
+
     # ---------- Validation requis + Calcul
     if ready:
-        missing = []
-        if not nom: missing.append("Nom de l’établissement")
-        if nb_places is None or nb_places == 0: missing.append("Nombre de places")
-        required_checks = [
-            ("Référent APS", referent is not None),
-            ("Formation spécifique", formation_referent is not None),
-            ("APS régulières", activite_reguliere is not None),
-            ("Part d’usagers concernés", nb_usagers is not None),
-            ("Durée hebdo moyenne", duree is not None),
-            ("Encadrement", len(encadrants) > 0),
-            ("Projet d’établissement", projet_etab is not None),
-            ("APS occasionnelles", occasionnelle is not None),
-        ]
-        for label, ok in required_checks:
-            if not ok: missing.append(label)
+        missing = missing_required(answers)
 
         if missing:
+            st.session_state.pop("qcm_result", None)
             st.error("Merci de compléter les indicateurs obligatoires : " + ", ".join(missing))
         else:
-            # Pack des réponses
-            answers = dict(
-                nom=nom, departement=departement, type_etab=type_etab,
-                public=public, tranche_age=tranche_age, nb_places=nb_places,
-                handicaps=handicaps,
-                referent=referent, formation_referent=formation_referent, organisme=organisme,
-                activite_reguliere=activite_reguliere, nb_usagers=nb_usagers, duree=duree,
-                types_activites=types_activites, freq_label=freq_label,
-                occasionnelle=occasionnelle,
-                objectifs=objectifs, satisfaction=satisfaction,
-                encadrants=encadrants, infrastructures=infrastructures,
-                projet_etab=projet_etab, liens=liens,
-                actions_existantes=actions_existantes, freins=freins
-            )
-
             # Calcul
             subs, indicateur_global = compute_indicators(answers)
-
-            # ---- Affichage KPI
-            st.markdown("<hr/>", unsafe_allow_html=True)
-            k1, k2, k3 = st.columns(3)
-            with k1:
-                st.markdown(f"<div class='card kpi'><h3>📈 Indicateur global</h3><h2 style='color:{color_for_score(indicateur_global)}'>{indicateur_global}/100</h2></div>", unsafe_allow_html=True)
-            with k2:
-                st.markdown(f"<div class='card kpi'><h3>🎯 Domaines ≥ 70</h3><h2>{sum(1 for v in subs.values() if v>=70)}/{len(subs)}</h2></div>", unsafe_allow_html=True)
-            with k3:
-                st.markdown(f"<div class='card kpi'><h3>🛠️ Domaines < 40</h3><h2>{sum(1 for v in subs.values() if v<40)}</h2></div>", unsafe_allow_html=True)
-
-            # ---- Barre progression (indicateur global, déjà présente)
-            bar_color = color_for_score(indicateur_global)
-            st.markdown(f"""
-            <div class='card'>
-              <div class='small'><span class='legend-dot' style='background:{bar_color}'></span>Légende : rouge &lt; 40, orange 40–69, vert ≥ 70</div>
-              <div class='progress-wrap'>
-                <div class='progress-bar' style='width:{indicateur_global}%; background:{bar_color};'>{indicateur_global}%</div>
-              </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # ---- Radar
-            fig = radar_chart(subs, "Toile d’araignée – Indicateurs par domaine (0–100)")
-            st.plotly_chart(fig, use_container_width=True)
-
-            # ---- Détails par domaine
-            st.markdown("### 🔎 Détail des indicateurs par domaine")
-            for d in DOMAINS_ORDER:
-                val = subs[d]
-                color = color_for_score(val)
-                st.markdown(f"<div class='card'><b>{d}</b> — <span style='color:{color}'><b>{val}/100</b></span></div>", unsafe_allow_html=True)
-
-            # ---- Conseils & accompagnement
-            st.markdown("### 🤝 Messages d’accompagnement et conseils")
-            for line in recommandations(subs):
-                st.markdown(f"- {line}")
-
-            # ---- Télécharger résultats
-            result_row = {
-                "Horodatage": datetime.now().isoformat(timespec='seconds'),
-                "Etablissement": nom, "Département": departement, "Type": type_etab,
-                "Tranche_age": tranche_age, "Places": nb_places, "Public": ";".join(public),
-                "Handicaps": ";".join(handicaps),
-                "Referent": referent, "Formation": formation_referent, "Organisme": organisme,
-                "Regulier": activite_reguliere, "Part_usagers": nb_usagers, "Duree_hebdo": duree,
-                "Types_reguliers": ";".join(types_activites), "Frequence": freq_label,
-                "Occasionnel": occasionnelle,
-                "Objectifs": ";".join(objectifs), "Satisfaction": ";".join(satisfaction),
-                "Encadrants": ";".join(encadrants), "Infrastructures": ";".join(infrastructures),
-                "Projet": projet_etab, "Liens": ";".join(liens),
-                **{f"Indic_{k}": v for k,v in subs.items()},
-                "Indicateur_global": indicateur_global
-            }
-            df_out = pd.DataFrame([result_row])
-
-            # Sauvegarde cumulée
-            try:
-                old = pd.read_excel("resultats_qcm.xlsx")
-                all_out = pd.concat([old, df_out], ignore_index=True)
-            except FileNotFoundError:
-                all_out = df_out
-            all_out.to_excel("resultats_qcm.xlsx", index=False)
-
-            # Bouton téléchargement (CSV individuel)
-            csv_bytes = df_out.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Télécharger mes résultats (CSV)", data=csv_bytes, file_name=f"resultats_{nom.replace(' ','_')}.csv", mime="text/csv", help="Export des indicateurs et réponses")
-
-            st.markdown("<div class='download-note'>Les résultats cumulés sont également enregistrés dans <b>resultats_qcm.xlsx</b> (pour la page Admin).</div>", unsafe_allow_html=True)
+            result_row = build_result_row(answers, subs, indicateur_global)
+
+            # Sauvegarde cumulée (ajout d'une ligne dans le store)
+            with metrics.stage("submit.save_rank_history"):
+                get_results_store().append(result_row)
+                peers = get_rollup().sync().rank(
+                    CURRENT_RUBRIC, departement, type_etab, tranche_age,
+                    {**{f"Indic_{d}": v for d, v in subs.items()}, "Indicateur_global": indicateur_global},
+                )
+                change = get_history().sync().last_change(nom)
+            with metrics.stage("submit.plan"):
+                plan = plan_improvements(answers)
+
+            # conservé en session : les reruns suivants réaffichent sans recalculer ni réenregistrer
+            st.session_state["qcm_result"] = dict(nom=nom, subs=subs, indicateur_global=indicateur_global, peers=peers,
+                                                  change=change and (change[0].horodatage, change[1]), plan=plan,
+                                                  csv=row_csv(result_row), horodatage=result_row["Horodatage"])
+
+    if "qcm_result" in st.session_state:
+        show_results(st.session_state["qcm_result"])
 
 # =========================
 # PAGE: ADMIN
 # =========================
 else:
     st.header("📊 Admin — Résultats globaux")
-    try:
-        df_all = pd.read_excel("resultats_qcm.xlsx")
-    except FileNotFoundError:
+    # Import d'un ancien classeur de scores (barème en points)
+    with st.expander("📥 Importer un ancien classeur de scores (.xlsx)"):
+        legacy_file = st.file_uploader("Classeur (ex. score_total_etablissements.xlsx)", type=["xlsx"])
+        if legacy_file is not None and st.button("Importer et noter les établissements"):
+            try:
+                n = import_legacy(legacy_file, get_results_store(), source=legacy_file.name)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                get_rollup().sync()
+                st.success(f"{n} établissement(s) importé(s).")
+
+    df_all = get_results_cache().frame()
+    if len(df_all) == 0:
         st.info("Aucune donnée enregistrée pour le moment. Revenez après quelques réponses.")
         df_all = None
 
     if df_all is not None and len(df_all)>0:
+        rollup = get_rollup().sync()
+
+        # Versions du barème : on ne mélange pas des échelles différentes dans les moyennes
+        vers_sel = CURRENT_RUBRIC if CURRENT_RUBRIC in rollup.versions else max(rollup.versions)
+        if len(rollup.versions) > 1:
+            vers = sorted(rollup.versions)
+            vers_sel = st.selectbox("Version du barème", vers, index=vers.index(vers_sel),
+                                    help="Les résultats d’anciennes versions peuvent être recalculés avec `python -m qcm.recompute --out <nouveau store>`, "
+                                         "puis l’application relancée avec `QCM_RESULTS_STORE=<nouveau store>`.")
+
         # Filtres
         f1,f2,f3 = st.columns(3)
-        deps = ["Tous"] + sorted(list(df_all["Département"].dropna().unique()))
-        types = ["Tous"] + sorted(list(df_all["Type"].dropna().unique()))
-        ages = ["Tous"] + sorted(list(df_all["Tranche_age"].dropna().unique()))
+        deps = ["Tous"] + rollup.options("Département")
+        types = ["Tous"] + rollup.options("Type")
+        ages = ["Tous"] + rollup.options("Tranche_age")
 
         dep_sel = f1.selectbox("Filtrer par département", deps)
         type_sel = f2.selectbox("Filtrer par type d’établissement", types)
         age_sel = f3.selectbox("Filtrer par tranche d’âge", ages)
 
-        df_view = df_all.copy()
-        if dep_sel!="Tous": df_view = df_view[df_view["Département"]==dep_sel]
-        if type_sel!="Tous": df_view = df_view[df_view["Type"]==type_sel]
-        if age_sel!="Tous": df_view = df_view[df_view["Tranche_age"]==age_sel]
-
-        st.dataframe(df_view, use_container_width=True)
-
-        # Moyennes par domaine
-        if len(df_view)>0:
-            means = {d: round(df_view[f"Indic_{d}"].mean(),1) for d in DOMAINS_ORDER if f"Indic_{d}" in df_view.columns}
-            fig_admin = radar_chart(means, "Moyenne des indicateurs — échantillon filtré")
+        def view_mask(df):
+            # un seul masque combiné (comparaisons sur les codes des catégories) ; sert aussi
+            # à filtrer les paquets relus du store pour l'export complet
+            mask = None
+            if len(rollup.versions) > 1 and VERSION_COLUMN in df.columns:
+                vcol = df[VERSION_COLUMN]
+                mask = (vcol == vers_sel) | (vcol.isna() & (vers_sel == LEGACY_RUBRIC))
+            for col, sel in (("Département", dep_sel), ("Type", type_sel), ("Tranche_age", age_sel)):
+                if sel != "Tous" and col in df.columns:
+                    mask = (df[col] == sel) if mask is None else mask & (df[col] == sel)
+            return mask
+
+        mask = view_mask(df_all)
+        df_view = df_all if mask is None else df_all[mask]
+
+        # au-delà de max_rows, le frame en cache ne garde que les soumissions les plus récentes
+        truncated = get_results_cache().truncated
+        if truncated:
+            st.warning(f"Tableau, comptes d’établissements, choix multiples et intervalles de confiance portent sur les "
+                       f"{get_results_cache().max_rows:,} soumissions les plus récentes "
+                       f"({truncated:,} plus anciennes écartées) ; le radar, les moyennes et l’export couvrent toutes les soumissions.")
+
+        # colonnes *_mask : encodage interne des choix multiples, lisibles dans leurs colonnes texte
+        st.dataframe(df_view.loc[:, [c for c in df_view.columns if not str(c).endswith(MASK_SUFFIX)]], use_container_width=True)
+
+        # Moyennes par domaine (lues dans les agrégats, sans parcourir les lignes)
+        agg = rollup.query(vers_sel, dep_sel, type_sel, age_sel)
+        if agg is not None:
+            means = {d: round(agg.mean(f"Indic_{d}"),1) for d in DOMAINS_ORDER}
+            fig_admin = cached_radar(means, "Moyenne des indicateurs — échantillon filtré")
             st.plotly_chart(fig_admin, use_container_width=True)
 
+            # Intervalles de confiance (bootstrap sur la vue filtrée), recalculés seulement si filtres ou données changent
+            ci_cols = [f"Indic_{d}" for d in DOMAINS_ORDER] + ["Indicateur_global"]
+            ci_key = (vers_sel, dep_sel, type_sel, age_sel, get_results_store().version())
+            ci = get_ci_cache().get(("ci", ci_key), lambda: frame_intervals(df_view, ci_cols), render_stats)
+            g_ci = ci["Indicateur_global"]
+            if g_ci["faible"]:
+                st.warning(f"Effectif faible ({g_ci['n']} soumission(s), moins de {MIN_PEERS}) : moyennes très incertaines, "
+                           "à ne comparer qu’en regardant les intervalles de confiance.")
+            st.dataframe([{"Domaine": d, "Moyenne": round(ci[f"Indic_{d}"]["mean"], 1),
+                           "IC 95 % bas": round(ci[f"Indic_{d}"]["lo"], 1), "IC 95 % haut": round(ci[f"Indic_{d}"]["hi"], 1),
+                           "n": ci[f"Indic_{d}"]["n"]} for d in DOMAINS_ORDER], use_container_width=True, hide_index=True)
+
             # KPIs admin
             c1,c2,c3 = st.columns(3)
-            c1.metric("Établissements (filtre)", len(df_view))
-            if "Indicateur_global" in df_view.columns:
-                # fix: pas de saut de ligne intempestif dans le f-string
-                c2.metric("Indicateur global moyen", f"{round(df_view['Indicateur_global'].mean(),1)}/100")
+            # établissements distincts : noms normalisés, doublons fusionnés comptés une fois
+            c1.metric("Établissements (filtre)", get_aliases().count_names(df_view["Etablissement"]),
+                      help=f"{agg.rows} soumission(s)")
+            # fix: pas de saut de ligne intempestif dans le f-string
+            c2.metric("Indicateur global moyen", f"{round(agg.mean('Indicateur_global'),1)}/100",
+                      help=f"IC 95 % : {g_ci['lo']:.1f} – {g_ci['hi']:.1f} (bootstrap, n = {g_ci['n']})")
             c3.metric("Dernière mise à jour", datetime.now().strftime("%d/%m/%Y %H:%M"))
         else:
             st.warning("Aucune ligne avec ces filtres.")
+
+        # Comparaison entre segments : une moyenne sur 3 établissements n'a pas le poids d'une moyenne sur 300
+        with st.expander("📏 Comparaison des segments (intervalles de confiance)"):
+            by = st.selectbox("Comparer par", SEGMENT_COLUMNS)
+            seg_key = (vers_sel, dep_sel, type_sel, age_sel, by, get_results_store().version())
+            seg = get_ci_cache().get(("ci_segments", seg_key),
+                                     lambda: segment_intervals(df_view, by, [f"Indic_{d}" for d in DOMAINS_ORDER] + ["Indicateur_global"]),
+                                     render_stats)
+            st.caption(f"Moyennes et IC 95 % (bootstrap) par segment de la vue filtrée ; « Effectif faible » sous {MIN_PEERS} "
+                       "soumissions. Deux segments dont les intervalles se chevauchent ne sont pas clairement différents.")
+            st.dataframe(seg, use_container_width=True, hide_index=True)
+
+        # Choix multiples : parts par type et co-occurrences (masques de bits, vue filtrée entière)
+        with st.expander("🧩 Choix multiples (freins, actions, objectifs…)"):
+            labels = {"freins": "Freins", "actions_existantes": "Actions mises en place", "objectifs": "Objectifs",
+                      "satisfaction": "Perception des usagers", "encadrants": "Encadrants", "liens": "Partenaires",
+                      "types_activites": "Types d’APS réguliers", "infrastructures": "Lieux de pratique",
+                      "handicaps": "Types de handicap", "public": "Public"}
+            m1, m2 = st.columns(2)
+            field = m1.selectbox("Réponse", MULTI_FIELDS, index=MULTI_FIELDS.index("freins"), format_func=labels.get)
+            st.caption("Part des soumissions citant chaque option (%), par type d’établissement.")
+            st.dataframe(share_by(df_view, field, "Type"), use_container_width=True)
+            field_b = m2.selectbox("Croiser avec", MULTI_FIELDS, index=MULTI_FIELDS.index("actions_existantes"), format_func=labels.get)
+            if field_b != field:
+                st.plotly_chart(heatmap_chart(cooccurrence(df_view, field, field_b), f"{labels[field]} × {labels[field_b]}"),
+                                use_container_width=True)
+
+        # Historique d'un établissement (soumissions successives, écarts à la précédente)
+        with st.expander("📈 Historique par établissement"):
+            etabs = get_history().sync().establishments()
+            if etabs:
+                key_sel = st.selectbox("Établissement", sorted(etabs, key=lambda k: etabs[k].casefold()), format_func=etabs.get)
+                timeline = get_history().timeline(key_sel)
+                st.caption(f"{len(timeline)} soumission(s) — l’écart n’est calculé qu’entre deux soumissions du même barème.")
+                if len(timeline) > 1:
+                    st.plotly_chart(history_chart(timeline), use_container_width=True)
+                st.dataframe(timeline, use_container_width=True)
+
+        # Doublons : variantes d'un même nom (fautes de frappe, mots en plus) proposées à la fusion
+        with st.expander("🧬 Doublons d’établissements"):
+            if st.button("Rechercher les doublons"):
+                st.session_state["dup_proposals"] = find_duplicates(identities_from_frame(df_all))
+            proposals = get_aliases().pending(st.session_state.get("dup_proposals", []))
+            st.caption(f"{len(get_aliases())} fusion(s) enregistrée(s) ; {len(proposals)} proposition(s) en attente.")
+            if proposals:
+                edited = st.data_editor(
+                    [dict(Fusionner=p["score"] >= 0.9, Garder=p["nom_keep"], Fusionner_avec=p["nom_drop"], Score=p["score"]) for p in proposals],
+                    disabled=["Garder", "Fusionner_avec", "Score"], use_container_width=True, key="dup_editor")
+                if st.button("Fusionner la sélection"):
+                    get_aliases().merge([(p["keep"], p["drop"]) for p, e in zip(proposals, edited) if e["Fusionner"]])
+                    st.rerun()
+
+        # Export de la vue filtrée (généré par paquets dans un fichier temporaire ; st.download_button attend des octets)
+        formats = ["csv", "xlsx"] + (["parquet"] if has_parquet() else [])
+        e1, e2 = st.columns([1,3])
+        fmt = e1.selectbox("Format d’export", formats, help="XLSX est nettement plus lent que CSV/Parquet sur de gros volumes.")
+        n_export = agg.rows if truncated and agg is not None else len(df_view)
+        if e2.button(f"📦 Préparer l’export {fmt.upper()} ({n_export} lignes)"):
+            # frame en cache tronqué : relecture du store entier par paquets, même filtre
+            chunks = store_chunks(get_results_store(), df_view.columns, view_mask) if truncated else None
+            with spooled_export(df_view, fmt, chunks=chunks) as export_file:
+                export_bytes = export_file.read()
+            st.download_button(f"⬇️ Télécharger resultats_qcm.{fmt}", data=export_bytes, file_name=f"resultats_qcm.{fmt}", mime=MIME[fmt])
+# =========================
+# INSTRUMENTATION (cache de rendu)
+# =========================
+with st.sidebar.expander("⚡ Cache de rendu", expanded=False):
+    _rc = get_render_cache()
+    st.caption(f"Ce rendu : {render_stats.hits} hit(s), {render_stats.misses} miss — "
+               f"{render_stats.saved*1000:.1f} ms économisées, {render_stats.spent*1000:.1f} ms de construction")
+    st.caption(f"Depuis le démarrage : taux de hit {_rc.totals.hit_rate:.0%}, "
+               f"{_rc.totals.saved:.2f} s économisées, {len(_rc)}/{_rc.maxsize} entrées")
+
+# Panneau caché (?debug=metrics) : latences récentes par étape
+if st.query_params.get("debug") == "metrics":
+    with st.sidebar.expander("⏱️ Mesures par étape", expanded=True):
+        if not metrics.REGISTRY.enabled:
+            st.caption("Mesures désactivées : relancer avec QCM_METRICS=1 (ou QCM_METRICS_LOG=fichier.jsonl).")
+        else:
+            snap = metrics.snapshot()
+            st.dataframe([{"Étape": k, "n": v["count"], "p50 ms": round(v["p50_ms"], 2), "p95 ms": round(v["p95_ms"], 2),
+                           "p99 ms": round(v["p99_ms"], 2)} for k, v in snap["stages"].items()], use_container_width=True)
+            if snap["counters"]:
+                st.json(snap["counters"])
+metrics.observe("app.rerun.questionnaire" if mode.startswith("📝") else "app.rerun.admin", time.perf_counter() - rerun_t0)
+
 # --- fin du script ; commentaires supplémentaires pour garder au moins le même volume de lignes :
 # Notes:
 # - Tous les libellés de widgets utilisent désormais du texte brut pour [obligatoire] (plus de <span> visibles).
@@ -0,0 +1,70 @@
+"""Durée et mémoire des exports (CSV, Parquet, XLSX) de la vue Admin.
+
+    python benchmarks/bench_export.py              # 500k lignes (XLSX : 20k)
+    python benchmarks/bench_export.py --rows 100000 --xlsx-rows 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generators import synthetic_frame
+from qcm.export import export_frame, has_parquet
+
+
+class _Sink:
+    """Fichier qui compte les octets sans les garder (mesure du coût de génération seul)."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+
+def _export(view, fmt):
+    if fmt == "csv":
+        sink = _Sink()
+        export_frame(view, fmt, sink)
+        return sink.size
+    with tempfile.TemporaryFile() as f:  # Parquet/XLSX écrivent dans un vrai fichier (seek)
+        export_frame(view, fmt, f)
+        return f.tell()
+
+
+def run(rows, xlsx_rows, memory=False):
+    df = synthetic_frame(rows, scored=True)
+    formats = [("csv", rows)] + ([("parquet", rows)] if has_parquet() else []) + [("xlsx", xlsx_rows)]
+    for fmt, n in formats:
+        view = df.iloc[:n]
+        t0 = time.perf_counter()
+        size = _export(view, fmt)
+        dt = time.perf_counter() - t0
+        line = f"{fmt:8} {n:>9,} lignes : {dt:6.2f} s  ({n / dt:>9,.0f} lignes/s)  {size / 1e6:7.1f} Mo"
+        if memory:
+            # second passage sous tracemalloc (qui ralentit fortement, d'où la mesure séparée)
+            tracemalloc.start()
+            _export(view.iloc[:min(n, 50_000)], fmt)
+            line += f"  pic mémoire (50k lignes max) {tracemalloc.get_traced_memory()[1] / 1e6:6.1f} Mo"
+            tracemalloc.stop()
+        print(line)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--xlsx-rows", type=int, default=20_000)
+    ap.add_argument("--memory", action="store_true", help="mesurer aussi le pic mémoire (tracemalloc)")
+    args = ap.parse_args()
+    run(args.rows, args.xlsx_rows, args.memory)
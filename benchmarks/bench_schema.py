@@ -0,0 +1,52 @@
+"""Mémoire par ligne et temps de filtrage Admin : frame brut (object) contre schéma typé.
+
+    python benchmarks/bench_schema.py               # 100k / 1M lignes
+    python benchmarks/bench_schema.py --sizes 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generators import synthetic_frame
+from qcm.schema import apply_schema, bytes_per_row
+from qcm.scoring import DOMAINS_ORDER
+
+
+def admin_filter(df):
+    # même enchaînement que la page Admin : masque combiné des 3 filtres puis moyennes par domaine
+    v = df[(df["Département"] == "59 - Nord") & (df["Type"] == "IME") & (df["Tranche_age"] == "Adultes")]
+    return {d: v[f"Indic_{d}"].mean() for d in DOMAINS_ORDER}
+
+
+def best_of(fn, runs=5):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(n):
+    # frame au format d'une relecture du store : chaque cellule texte est un objet distinct
+    raw = synthetic_frame(n, scored=True)
+    raw = raw.astype({c: object for c in raw.columns if raw[c].dtype == object}).copy(deep=True)
+    t0 = time.perf_counter()
+    typed = apply_schema(raw)
+    conv = time.perf_counter() - t0
+    b_raw, b_typed = bytes_per_row(raw), bytes_per_row(typed)
+    f_raw, f_typed = best_of(lambda: admin_filter(raw)), best_of(lambda: admin_filter(typed))
+    print(f"{n:>9,} lignes  mémoire {b_raw:7.0f} -> {b_typed:5.0f} o/ligne (x{b_raw / b_typed:4.1f})  "
+          f"filtre Admin {f_raw * 1000:8.2f} -> {f_typed * 1000:6.2f} ms (x{f_raw / f_typed:4.1f})  "
+          f"conversion {conv:5.2f} s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = ap.parse_args()
+    for n in args.sizes:
+        run(n)
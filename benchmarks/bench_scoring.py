@@ -0,0 +1,79 @@
+"""Parité et débit du calcul en lot (`compute_indicators_batch`) face au calcul unitaire.
+
+    python benchmarks/bench_scoring.py            # parité + 10k / 100k / 1M lignes
+    python benchmarks/bench_scoring.py --sizes 10000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from generators import random_answers, subsets, synthetic_frame
+from qcm.options import OPTIONS, MULTI_FIELDS
+from qcm.scoring import DOMAIN_FIELDS, DOMAINS_ORDER, compute_indicators, compute_indicators_batch, answers_to_row, row_to_answers
+
+
+def exhaustive_answers(seed=0):
+    rng = random.Random(seed)
+    # toutes les combinaisons des champs de chaque domaine
+    for fields in DOMAIN_FIELDS.values():
+        choices = [subsets(OPTIONS[f]) if f in MULTI_FIELDS else OPTIONS[f] for f in fields]
+        for combo in itertools.product(*choices):
+            a = random_answers(rng, valid=False)
+            a.update(zip(fields, combo))
+            yield a
+
+
+def parity_mismatches():
+    """(combinaisons testées, écarts [(attendu, obtenu)]) entre calcul en lot et calcul unitaire."""
+    answers = list(exhaustive_answers())
+    df = pd.DataFrame([answers_to_row(a) for a in answers])
+    batch = compute_indicators_batch(df)
+    cols = [f"Indic_{d}" for d in DOMAINS_ORDER] + ["Indicateur_global"]
+    mismatches = []
+    for a, got in zip(answers, batch[cols].itertuples(index=False)):
+        subs, glob = compute_indicators(a)
+        expected = tuple(subs[d] for d in DOMAINS_ORDER) + (glob,)
+        if tuple(got) != expected:
+            mismatches.append((expected, tuple(got)))
+    return len(answers), mismatches
+
+
+def check_parity():
+    n, mismatches = parity_mismatches()
+    for expected, got in mismatches[:5]:
+        print("  écart :", expected, got)
+    print(f"parité : {n} combinaisons, {len(mismatches)} écart(s)")
+    return not mismatches
+
+
+def bench(sizes):
+    for n in sizes:
+        df = synthetic_frame(n)
+        t0 = time.perf_counter()
+        compute_indicators_batch(df)
+        dt = time.perf_counter() - t0
+        print(f"lot    {n:>9,} lignes : {dt:7.3f} s  ({n / dt:,.0f} lignes/s)")
+        if n == sizes[0]:
+            records = [row_to_answers(r) for r in df.head(10_000).to_dict("records")]
+            t0 = time.perf_counter()
+            for a in records:
+                compute_indicators(a)
+            dt = time.perf_counter() - t0
+            print(f"unitaire {len(records):>7,} lignes : {dt:7.3f} s  ({len(records) / dt:,.0f} lignes/s)")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--skip-parity", action="store_true")
+    args = ap.parse_args()
+    if not args.skip_parity and not check_parity():
+        sys.exit(1)
+    bench(args.sizes)
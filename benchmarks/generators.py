@@ -0,0 +1,100 @@
+"""Générateurs de réponses synthétiques pour les benchmarks.
+
+Toutes les options de toutes les listes du formulaire (qcm.options.OPTIONS)
+apparaissent : `covering_answers` produit un jeu minimal qui les parcourt
+toutes, `random_answers` tire le reste au hasard (graine fixe = reproductible).
+"""
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qcm.options import MULTI_FIELDS, OPTIONS
+from qcm.scoring import answers_to_row, compute_indicators, result_row
+
+DEPARTEMENTS = OPTIONS["departement"]
+
+
+def subsets(items):
+    return [list(c) for r in range(len(items) + 1) for c in itertools.combinations(items, r)]
+
+
+def random_answers(rng, valid=True):
+    """Réponses tirées au hasard ; `valid` garantit les champs obligatoires du formulaire."""
+    a = {"nom": f"ESMS {rng.randrange(10**6)}", "nb_places": rng.randrange(1, 120)}
+    for key, opts in OPTIONS.items():
+        a[key] = rng.sample(opts, rng.randrange(len(opts) + 1)) if key in MULTI_FIELDS else rng.choice(opts)
+    if valid and not a["encadrants"]:
+        a["encadrants"] = [rng.choice(OPTIONS["encadrants"])]
+    return a
+
+
+def covering_answers(seed=0):
+    """Jeu minimal où chaque option de chaque liste apparaît au moins une fois."""
+    rng = random.Random(seed)
+    width = max(len(opts) for opts in OPTIONS.values())
+    for i in range(width):
+        a = random_answers(rng)
+        for key, opts in OPTIONS.items():
+            opt = opts[i % len(opts)]
+            a[key] = [opt] if key in MULTI_FIELDS else opt
+        yield a
+
+
+def answers_stream(n, seed=0):
+    """`n` réponses : le jeu couvrant d'abord, puis des tirages aléatoires."""
+    rng = random.Random(seed)
+    produced = 0
+    for a in covering_answers(seed):
+        if produced >= n:
+            return
+        yield a
+        produced += 1
+    while produced < n:
+        yield random_answers(rng)
+        produced += 1
+
+
+def result_rows(n, seed=0):
+    """Lignes de résultats complètes (réponses + indicateurs), comme enregistrées par l'UI."""
+    for a in answers_stream(n, seed):
+        subs, g = compute_indicators(a)
+        yield result_row(a, subs, g)
+
+
+def synthetic_frame(n, seed=1, scored=False, pool=5000):
+    """DataFrame de `n` lignes au format des résultats.
+
+    On génère au plus `pool` lignes distinctes puis on les répète : le coût des
+    traitements colonne ne dépend pas de l'unicité, et 1M de lignes reste rapide.
+    """
+    import pandas as pd
+    m = min(n, pool)
+    rows = list(result_rows(m, seed)) if scored else [answers_to_row(a) for a in answers_stream(m, seed)]
+    base = pd.DataFrame(rows)
+    reps = -(-n // len(base))
+    return pd.concat([base] * reps, ignore_index=True).iloc[:n] if reps > 1 else base
+
+
+def establishment_identities(n, seed=0, typo_rate=0.05):
+    """`n` identités (format `qcm.identity.find_duplicates`) dont une part sont
+    des variantes à une faute de frappe d'un autre nom."""
+    from qcm.history import establishment_key
+    rng = random.Random(seed)
+    syl = ["ma", "ri", "lo", "ne", "ber", "tin", "vil", "mont", "sa", "che", "gre", "lan", "dor", "pi", "qua", "ros"]
+    words = ["".join(rng.choice(syl) for _ in range(rng.randint(2, 4))) for _ in range(max(n // 10, 50))]
+    common = ["les", "le", "la", "saint", "foyer", "centre", "residence", "maison"]
+    out = []
+    for i in range(n):
+        if out and rng.random() < typo_rate:
+            base = rng.choice(out)
+            p = rng.randrange(len(base["key"]))
+            out.append(dict(base, key=base["key"][:p] + base["key"][p + 1:], submissions=1))
+            continue
+        type_etab = rng.choice(OPTIONS["type_etab"])
+        nom = f"{type_etab} {rng.choice(common)} {' '.join(rng.sample(words, rng.randint(1, 2)))} {rng.choice(words).capitalize()}"
+        out.append(dict(key=establishment_key(nom), nom=nom, departement=rng.choice(DEPARTEMENTS + [""]),
+                        type=type_etab if rng.random() > 0.1 else "", submissions=rng.randrange(1, 5)))
+    return out
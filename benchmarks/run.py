@@ -0,0 +1,566 @@
+"""Suite de benchmarks des chemins chauds (sans navigateur ni Streamlit).
+
+    python benchmarks/run.py                      # tailles 100, 10k, 100k
+    python benchmarks/run.py --sizes 100 1000000  # jusqu'à 1M de lignes
+    python benchmarks/run.py --only admin         # cas dont le nom contient "admin"
+    python benchmarks/run.py --save-baseline      # enregistre benchmarks/baseline.json
+    python benchmarks/run.py --compare            # compare au baseline, code 1 si régression
+    python benchmarks/run.py --only startup app --check-budgets   # budgets de démarrage/rerun
+
+Pour chaque cas : latences p50 / p95 / p99, débit (lignes/s ou appels/s) et pic
+mémoire Python (tracemalloc, mesuré sur un passage séparé pour ne pas fausser
+les temps). `--profile NOM` affiche le profil cProfile d'un cas.
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generators import answers_stream, synthetic_frame
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [100, 10_000, 100_000]
+LEGACY_MAX_ROWS = 10_000      # chemins xlsx historiques : au-delà, trop lent pour être utile
+REGRESSION = 1.25             # p50 > 125 % du baseline = régression…
+MIN_DELTA_MS = 0.05           # …et au moins 50 µs d'écart (bruit des cas en microsecondes)
+# Budgets absolus (p50, ms) vérifiés par --check-budgets ; l'import inclut le
+# démarrage de l'interpréteur (~20 ms).
+BUDGETS_MS = {
+    "startup.import_scoring_core": 150,
+    "startup.import_app_modules": 1500,
+    "app.rerun_questionnaire": 250,
+}
+
+CASES = []
+
+
+def case(name, sized=True, max_rows=None, unit="appels"):
+    """Déclare un cas : `setup(n, tmp)` -> contexte, puis la fonction mesurée `run(ctx)`.
+
+    `sized` : le cas dépend de la taille du jeu de données (débit en lignes/s).
+    """
+    def deco(setup):
+        CASES.append(dict(name=name, setup=setup, sized=sized, max_rows=max_rows, unit=unit))
+        return setup
+    return deco
+
+
+# ---------- Démarrage et rerun de l'app
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+
+def _import_time(modules):
+    # interpréteur neuf à chaque appel : mesure un démarrage à froid, et échoue si
+    # un module lourd est chargé par effet de bord
+    code = (f"import sys\nimport {', '.join(modules)}\n"
+            f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+            f"assert not heavy, f'import au démarrage : {{heavy}}'")
+
+    def run():
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+    return run
+
+
+@case("startup.import_scoring_core", sized=False)
+def _(n, tmp):
+    return _import_time(["qcm.scoring"])
+
+
+@case("startup.import_app_modules", sized=False)
+def _(n, tmp):
+    return _import_time(["streamlit", "qcm.bootstrap", "qcm.charts", "qcm.export", "qcm.identity", "qcm.legacy", "qcm.metrics", "qcm.multichoice", "qcm.options", "qcm.planner",
+                         "qcm.render", "qcm.rollup", "qcm.rubric", "qcm.scoring", "qcm.storage"])
+
+
+@case("app.rerun_questionnaire", sized=False)
+def _(n, tmp):
+    # rerun complet du script (page Questionnaire, aucun champ saisi), comme à
+    # chaque interaction d'un widget
+    from streamlit.testing.v1 import AppTest
+    os.environ["QCM_RESULTS_STORE"] = os.path.join(tmp, "rerun.sqlite")
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.run()
+    return at.run
+
+
+# ---------- Instrumentation (qcm.metrics)
+
+def _metrics_overhead(enabled):
+    from qcm.metrics import Registry
+    reg = Registry(enabled=enabled)
+
+    @reg.timed("bench.noop")
+    def noop():
+        return None
+
+    def run():
+        for _ in range(1000):
+            noop()
+    return run
+
+
+@case("metrics.timed_x1000_disabled", sized=False)
+def _(n, tmp):
+    return _metrics_overhead(False)
+
+
+@case("metrics.timed_x1000_enabled", sized=False)
+def _(n, tmp):
+    return _metrics_overhead(True)
+
+
+# ---------- Calcul unitaire (formulaire)
+
+@case("scoring.compute_indicators", sized=False)
+def _(n, tmp):
+    from qcm.scoring import compute_indicators
+    answers = list(answers_stream(1000))
+    it = iter(range(10**9))
+    return lambda: compute_indicators(answers[next(it) % len(answers)])
+
+
+@case("scoring.recommandations", sized=False)
+def _(n, tmp):
+    from qcm.scoring import compute_indicators, recommandations
+    subs = [compute_indicators(a)[0] for a in answers_stream(1000)]
+    it = iter(range(10**9))
+    return lambda: recommandations(subs[next(it) % len(subs)])
+
+
+@case("charts.radar_chart", sized=False)
+def _(n, tmp):
+    from qcm.charts import radar_chart
+    from qcm.scoring import compute_indicators
+    subs = [compute_indicators(a)[0] for a in answers_stream(100)]
+    it = iter(range(10**9))
+    return lambda: radar_chart(subs[next(it) % len(subs)])
+
+
+# ---------- Calcul en lot
+
+@case("scoring.compute_indicators_batch", unit="lignes")
+def _(n, tmp):
+    from qcm.scoring import compute_indicators_batch
+    df = synthetic_frame(n)
+    return lambda: compute_indicators_batch(df)
+
+
+# ---------- Enregistrement d'une soumission
+
+def _row():
+    from generators import result_rows
+    return next(result_rows(1, seed=random.randrange(10**6)))
+
+
+@case("submit.xlsx_rewrite (historique)", max_rows=LEGACY_MAX_ROWS)
+def _(n, tmp):
+    # ancien chemin : read_excel + concat + to_excel du fichier complet
+    import pandas as pd
+    path = os.path.join(tmp, "resultats_qcm.xlsx")
+    synthetic_frame(n, scored=True).to_excel(path, index=False)
+
+    def run():
+        old = pd.read_excel(path)
+        pd.concat([old, pd.DataFrame([_row()])], ignore_index=True).to_excel(path, index=False)
+    return run
+
+
+@case("submit.store_append")
+def _(n, tmp):
+    from qcm.storage import SQLiteStore
+    store = SQLiteStore(os.path.join(tmp, "results.sqlite"))
+    store.append_many(synthetic_frame(n, scored=True).to_dict("records"))
+    return lambda: store.append(_row())
+
+
+# ---------- Page Admin
+
+@case("admin.read_excel (historique)", max_rows=LEGACY_MAX_ROWS, unit="lignes")
+def _(n, tmp):
+    import pandas as pd
+    path = os.path.join(tmp, "resultats_qcm.xlsx")
+    synthetic_frame(n, scored=True).to_excel(path, index=False)
+    return lambda: pd.read_excel(path)
+
+
+def _store(n, tmp):
+    from qcm.storage import SQLiteStore
+    store = SQLiteStore(os.path.join(tmp, f"admin_{n}.sqlite"))
+    if store.is_empty():
+        store.append_many(synthetic_frame(n, scored=True).to_dict("records"))
+    return store
+
+
+@case("admin.cache_cold_load", unit="lignes")
+def _(n, tmp):
+    from qcm.storage import ResultsCache
+    store = _store(n, tmp)
+    return lambda: ResultsCache(store).frame()
+
+
+@case("admin.cache_warm_rerun")
+def _(n, tmp):
+    from qcm.storage import ResultsCache
+    cache = ResultsCache(_store(n, tmp))
+    cache.frame()
+    return cache.frame
+
+
+@case("admin.filter_scan_means")
+def _(n, tmp):
+    # ancien chemin : copie + 3 masques + moyennes par domaine
+    from qcm.scoring import DOMAINS_ORDER
+    df = synthetic_frame(n, scored=True)
+
+    def run():
+        v = df.copy()
+        v = v[v["Département"] == "59 - Nord"]
+        v = v[v["Type"] == "IME"]
+        v = v[v["Tranche_age"] == "Adultes"]
+        return {d: v[f"Indic_{d}"].mean() for d in DOMAINS_ORDER}, v["Indicateur_global"].mean()
+    return run
+
+
+@case("admin.filter_typed_means")
+def _(n, tmp):
+    # mêmes filtres sur le frame au schéma typé (qcm.schema)
+    from qcm.schema import apply_schema
+    from qcm.scoring import DOMAINS_ORDER
+    df = apply_schema(synthetic_frame(n, scored=True))
+
+    def run():
+        v = df[(df["Département"] == "59 - Nord") & (df["Type"] == "IME") & (df["Tranche_age"] == "Adultes")]
+        return {d: v[f"Indic_{d}"].mean() for d in DOMAINS_ORDER}, v["Indicateur_global"].mean()
+    return run
+
+
+@case("admin.apply_schema", unit="lignes")
+def _(n, tmp):
+    from qcm.schema import apply_schema
+    df = synthetic_frame(n, scored=True)
+    return lambda: apply_schema(df)
+
+
+@case("admin.rollup_build", unit="lignes")
+def _(n, tmp):
+    from qcm.rollup import Rollup
+    df = synthetic_frame(n, scored=True)
+
+    def run():
+        Rollup().add_frame(df)
+    return run
+
+
+@case("admin.rollup_query")
+def _(n, tmp):
+    from qcm.rollup import Rollup
+    from qcm.scoring import DOMAINS_ORDER
+    r = Rollup()
+    r.add_frame(synthetic_frame(n, scored=True))
+
+    def run():
+        agg = r.query("v1", "59 - Nord", "IME", "Adultes")
+        return {d: agg.mean(f"Indic_{d}") for d in DOMAINS_ORDER} if agg else None
+    return run
+
+
+@case("admin.rollup_rank")
+def _(n, tmp):
+    from qcm.rollup import METRICS, Rollup
+    from qcm.rubric import VERSION_COLUMN
+    df = synthetic_frame(n, scored=True)
+    r = Rollup()
+    r.add_frame(df)
+    rows = df.sample(min(n, 1000), random_state=0).to_dict("records")
+    it = iter(range(10**9))
+
+    def run():
+        row = rows[next(it) % len(rows)]
+        return r.rank(row[VERSION_COLUMN], row["Département"], row["Type"], row["Tranche_age"], {m: row[m] for m in METRICS})
+    return run
+
+
+@case("admin.rollup_sync_submission")
+def _(n, tmp):
+    # une soumission ajoutée au store puis intégrée au rollup déjà chargé (insort)
+    from qcm.rollup import Rollup
+    from qcm.storage import open_store
+    store = open_store(os.path.join(tmp, f"rollup_{n}.sqlite"))
+    rows = synthetic_frame(n, scored=True).to_dict("records")
+    store.append_many(rows)
+    r = Rollup(store).sync()
+
+    def run():
+        store.append(rows[0])
+        r.sync()
+    return run
+
+
+@case("admin.multichoice_split_scan (historique)", unit="lignes")
+def _(n, tmp):
+    # ancien chemin : découpage des chaînes ";" ligne par ligne
+    df = synthetic_frame(n, scored=True)
+    from qcm.options import OPTIONS
+
+    def run():
+        counts = {(a, b): 0 for a in OPTIONS["freins"] for b in OPTIONS["actions_existantes"]}
+        for f, a in zip(df["Freins"], df["Actions"]):
+            acts = a.split(";") if isinstance(a, str) and a else []
+            for x in (f.split(";") if isinstance(f, str) and f else []):
+                for y in acts:
+                    counts[x, y] += 1
+        return counts
+    return run
+
+
+@case("admin.multichoice_cooccurrence", unit="lignes")
+def _(n, tmp):
+    from qcm.multichoice import cooccurrence
+    df = synthetic_frame(n, scored=True)
+    return lambda: cooccurrence(df, "freins", "actions_existantes")
+
+
+@case("admin.multichoice_share_by_type", unit="lignes")
+def _(n, tmp):
+    from qcm.multichoice import share_by
+    df = synthetic_frame(n, scored=True)
+    return lambda: share_by(df, "freins", "Type")
+
+
+@case("admin.bootstrap_intervals", unit="lignes")
+def _(n, tmp):
+    # IC 95 % des 8 moyennes de la vue filtrée (KPI et tableau sous le radar)
+    from qcm.bootstrap import frame_intervals
+    from qcm.rollup import METRICS
+    from qcm.schema import apply_schema
+    df = apply_schema(synthetic_frame(n, scored=True))
+    return lambda: frame_intervals(df, METRICS)
+
+
+@case("admin.bootstrap_segments", unit="lignes")
+def _(n, tmp):
+    # IC par type d'établissement, sans pool (les paquets du pool font le même calcul)
+    from qcm.bootstrap import segment_intervals
+    from qcm.rollup import METRICS
+    from qcm.schema import apply_schema
+    df = apply_schema(synthetic_frame(n, scored=True))
+    return lambda: segment_intervals(df, "Type", METRICS, workers=1)
+
+
+@case("history.last_change")
+def _(n, tmp):
+    # n soumissions réparties sur n/10 établissements (≈ 10 par établissement)
+    from qcm.history import History
+    h = History()
+    rows = synthetic_frame(n, scored=True).to_dict("records")
+    for i, row in enumerate(rows):
+        row["Etablissement"] = f"ESMS {i % max(n // 10, 1)}"
+        h.add_row(row)
+    names = [f"esms  {i}" for i in range(max(n // 10, 1))]
+    it = iter(range(10**9))
+    return lambda: h.last_change(names[next(it) % len(names)])
+
+
+@case("identity.find_duplicates", unit="lignes")
+def _(n, tmp):
+    # n noms d'établissements, dont ≈ 5 % de variantes à une faute de frappe
+    from generators import establishment_identities
+    from qcm.identity import find_duplicates
+    idents = establishment_identities(n)
+    return lambda: find_duplicates(idents)
+
+
+@case("reports.render_batch", sized=False)
+def _(n, tmp):
+    # un paquet de qcm.reports.BATCH rapports HTML (tâche d'un processus du pool)
+    from generators import result_rows
+    from qcm.reports import BATCH, render_batch
+    items = [(f"esms {i}", row) for i, row in enumerate(result_rows(BATCH))]
+    return lambda: render_batch(items)
+
+
+
+@case("planner.plan_improvements", sized=False)
+def _(n, tmp):
+    # toutes les modifications seules et par deux d'un formulaire type
+    from qcm.planner import plan_improvements
+    answers = next(answers_stream(1, seed=3))
+    return lambda: plan_improvements(answers)
+
+
+# ---------- Mesure
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(fn, min_runs=5, max_runs=10_000, budget=2.0):
+    """Exécute `fn` jusqu'à `max_runs` fois ou `budget` secondes (au moins `min_runs`).
+
+    Un cas dont l'échauffement dépasse déjà le budget (chemins xlsx historiques)
+    n'est rejoué que deux fois.
+    """
+    t0 = time.perf_counter()
+    fn()  # échauffement (imports, caches)
+    if time.perf_counter() - t0 > budget:
+        min_runs = 2
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or (time.perf_counter() - start < budget and min_runs > 2)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return sorted(times)
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes, only=None, budget=2.0, memory=True):
+    results = []
+    tmp = tempfile.mkdtemp(prefix="qcm_bench_")
+    try:
+        for c in CASES:
+            if only and not any(o in c["name"] for o in only):
+                continue
+            for n in (sizes if c["sized"] else [None]):
+                if n is not None and c["max_rows"] and n > c["max_rows"]:
+                    continue
+                random.seed(0)
+                fn = c["setup"](n, tmp)
+                times = measure(fn, budget=budget)
+                p50 = percentile(times, 50)
+                res = {
+                    "case": c["name"], "rows": n, "runs": len(times),
+                    "p50_ms": p50 * 1000, "p95_ms": percentile(times, 95) * 1000,
+                    "p99_ms": percentile(times, 99) * 1000,
+                    "throughput": (n if c["unit"] == "lignes" else 1) / p50 if p50 > 0 else float("inf"),
+                    "unit": f"{c['unit']}/s",
+                }
+                if memory:
+                    res["peak_mb"] = peak_memory(fn) / 1e6
+                results.append(res)
+                print(format_result(res), flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def key(res):
+    return f"{res['case']}[{res['rows'] or '-'}]"
+
+
+def format_result(res):
+    mem = f"{res['peak_mb']:8.1f} Mo" if "peak_mb" in res else ""
+    return (f"{key(res):48} p50 {res['p50_ms']:10.3f} ms  p95 {res['p95_ms']:10.3f}  p99 {res['p99_ms']:10.3f}  "
+            f"{res['throughput']:>14,.0f} {res['unit']:10} {mem}")
+
+
+def save_baseline(results, path=BASELINE):
+    data = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {key(r): r for r in results},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    print(f"baseline enregistré : {path}")
+
+
+def compare(results, path=BASELINE, threshold=REGRESSION):
+    with open(path, encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    regressions = 0
+    print(f"\ncomparaison au baseline ({path}) — seuil x{threshold}")
+    for r in results:
+        b = base.get(key(r))
+        if b is None:
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"] if b["p50_ms"] else float("inf")
+        slower = ratio > threshold and r["p50_ms"] - b["p50_ms"] > MIN_DELTA_MS
+        flag = "RÉGRESSION" if slower else "ok"
+        regressions += flag != "ok"
+        print(f"{key(r):48} {b['p50_ms']:10.3f} -> {r['p50_ms']:10.3f} ms  x{ratio:5.2f}  {flag}")
+    return regressions
+
+
+def check_budgets(results, budgets=BUDGETS_MS):
+    over = 0
+    checked = [r for r in results if r["case"] in budgets]
+    if checked:
+        print("\nbudgets (p50)")
+    for r in checked:
+        limit = budgets[r["case"]]
+        flag = "ok" if r["p50_ms"] <= limit else "DÉPASSÉ"
+        over += flag != "ok"
+        print(f"{key(r):48} {r['p50_ms']:10.1f} ms / {limit} ms  {flag}")
+    return over
+
+
+def profile(name, n):
+    c = next(c for c in CASES if name in c["name"])
+    tmp = tempfile.mkdtemp(prefix="qcm_prof_")
+    try:
+        fn = c["setup"](n if c["sized"] else None, tmp)
+        fn()
+        prof = cProfile.Profile()
+        prof.enable()
+        for _ in range(20 if c["sized"] else 1000):
+            fn()
+        prof.disable()
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(25)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks des chemins chauds du QCM APS")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--only", nargs="+", help="filtre sur le nom des cas")
+    ap.add_argument("--budget", type=float, default=2.0, help="secondes max par cas et par taille")
+    ap.add_argument("--no-memory", action="store_true")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--compare", action="store_true")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--check-budgets", action="store_true", help="code 1 si un budget BUDGETS_MS est dépassé")
+    ap.add_argument("--profile", metavar="CAS", help="profil cProfile d'un cas (taille : première de --sizes)")
+    args = ap.parse_args(argv)
+
+    if args.profile:
+        profile(args.profile, args.sizes[0])
+        return 0
+    results = run_suite(args.sizes, args.only, args.budget, not args.no_memory)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    failed = check_budgets(results) if args.check_budgets else 0
+    if args.compare:
+        failed += compare(results, args.baseline)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
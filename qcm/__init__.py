@@ -0,0 +1,5 @@
+"""Cœur métier du test d'auto-positionnement APS (stockage, calculs hors UI).
+
+Les modules n'importent au chargement que la bibliothèque standard ; pandas,
+NumPy, Plotly et openpyxl sont importés dans les fonctions qui en ont besoin.
+"""
@@ -0,0 +1,294 @@
+"""API HTTP de notation, sans Streamlit.
+
+    python -m qcm.api --port 8502 [--store resultats_qcm.sqlite]
+
+    POST /score        un dict `answers` ou une liste de dicts (lot)
+                       -> {"subs", "indicateur_global", "recommandations", "version"}
+                       ?persist=0 pour noter sans enregistrer
+    GET  /export.csv | /export.xlsx | /export.parquet
+                       ?dep=…&type=…&age=… : résultats filtrés, envoyés par paquets
+    GET  /health
+    GET  /metrics      latences par étape et compteurs (si QCM_METRICS=1, cf. qcm.metrics)
+
+Serveur asyncio minimal (HTTP/1.1 keep-alive, corps JSON). Les enregistrements
+de toutes les requêtes en cours sont regroupés en une seule transaction
+(commit groupé) par un écrivain unique, puis la réponse est envoyée.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from qcm import metrics
+from qcm.export import MIME, frame_chunks, has_parquet, iter_csv, spooled_export
+from qcm.options import OPTIONS, MULTI_FIELDS
+from qcm.rubric import CURRENT_RUBRIC
+from qcm.scoring import compute_indicators, missing_required, recommandations, result_row
+from qcm.storage import DEFAULT_STORE, ResultsCache, open_store
+
+MAX_BODY = 16 * 1024 * 1024
+MAX_BATCH = 10_000
+# choix simples facultatifs : valeur par défaut du formulaire (première option) si absents
+OPTIONAL_DEFAULTS = {k: OPTIONS[k][0] for k in ("organisme", "freq_label")}
+
+
+def validate(answers):
+    """Erreurs de validation : champs obligatoires (règles du formulaire) et valeurs hors listes."""
+    if not isinstance(answers, dict):
+        return ["objet JSON attendu"]
+    errors = [f"champ obligatoire manquant : {label}" for label in missing_required(answers)]
+    for key, opts in OPTIONS.items():
+        v = answers.get(key)
+        if v is None:
+            continue
+        if key in MULTI_FIELDS:
+            if not isinstance(v, list) or any(x not in opts for x in v):
+                errors.append(f"{key} : liste de valeurs parmi {opts} attendue")
+        elif v not in opts:
+            errors.append(f"{key} : valeur inconnue {v!r}")
+    nom = answers.get("nom")
+    if nom is not None and not isinstance(nom, str):
+        errors.append("nom : texte attendu")
+    nb = answers.get("nb_places")
+    if nb is not None and (not isinstance(nb, int) or isinstance(nb, bool) or nb < 0):
+        errors.append("nb_places : entier positif attendu")
+    return errors
+
+
+def score(answers):
+    """Note un dict `answers` déjà validé ; renvoie (réponse JSON, ligne à enregistrer)."""
+    answers = {**{k: [] for k in MULTI_FIELDS}, **OPTIONAL_DEFAULTS,
+               **{k: v for k, v in answers.items() if v is not None}}
+    subs, indicateur_global = compute_indicators(answers)
+    body = {
+        "subs": subs,
+        "indicateur_global": indicateur_global,
+        "recommandations": recommandations(subs),
+        "version": CURRENT_RUBRIC,
+    }
+    return body, result_row(answers, subs, indicateur_global)
+
+
+class GroupWriter:
+    """Écrivain unique : regroupe les lignes de toutes les requêtes en attente en un seul append.
+
+    La tâche d'écriture est lancée au premier `write`, dans la boucle de l'appelant.
+    """
+
+    def __init__(self, store, max_rows=5_000):
+        self.store = store
+        self.max_rows = max_rows
+        self.queue = asyncio.Queue()
+        self._task = None
+
+    async def write(self, rows):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, done))
+        await done
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            n = len(pending[0][0])
+            while n < self.max_rows and not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+                n += len(pending[-1][0])
+            rows = [r for batch, _ in pending for r in batch]
+            try:
+                await loop.run_in_executor(None, self.store.append_many, rows)
+            except Exception as e:  # l'erreur est renvoyée à chaque requête du lot
+                for _, fut in pending: fut.set_exception(e)
+            else:
+                for _, fut in pending: fut.set_result(None)
+
+
+def _route(method, target):
+    # nom d'étape borné : chemins connus seulement
+    path = urlsplit(target).path
+    if path.startswith("/export."):
+        path = "/export"
+    elif path not in ("/score", "/health", "/metrics"):
+        path = "/autre"
+    return f"api.{method} {path}"
+
+
+class ScoringServer:
+    def __init__(self, store):
+        self.writer = GroupWriter(store) if store is not None else None
+        self.cache = ResultsCache(store, typed=True) if store is not None else None
+
+    def export_view(self, query):
+        df = self.cache.frame()
+        for param, col in (("dep", "Département"), ("type", "Type"), ("age", "Tranche_age")):
+            value = query.get(param, [None])[0]
+            if value and value != "Tous" and col in df.columns:
+                df = df[df[col] == value]
+        return df
+
+    async def handle_score(self, payload, persist):
+        batch = isinstance(payload, list)
+        items = payload if batch else [payload]
+        if len(items) > MAX_BATCH:
+            return 413, {"error": f"lot limité à {MAX_BATCH} éléments"}
+        results, rows = [], []
+        for answers in items:
+            errors = validate(answers)
+            if errors:
+                results.append({"errors": errors})
+                continue
+            body, row = score(answers)
+            results.append(body)
+            rows.append(row)
+        if persist and rows and self.writer is not None:
+            await self.writer.write(rows)
+        if batch:
+            return 200, {"results": results, "enregistres": len(rows) if persist and self.writer is not None else 0}
+        return (422 if "errors" in results[0] else 200), results[0]
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/health" and method == "GET":
+            return 200, {"status": "ok", "version": CURRENT_RUBRIC}
+        if url.path == "/metrics" and method == "GET":
+            if not metrics.REGISTRY.enabled:
+                return 404, {"error": "mesures désactivées (QCM_METRICS=1)"}
+            return 200, metrics.snapshot()
+        if url.path.startswith("/export.") and method == "GET":
+            fmt = url.path.rsplit(".", 1)[1]
+            if fmt not in MIME or (fmt == "parquet" and not has_parquet()):
+                return 404, {"error": f"format non disponible : {fmt}"}
+            if self.cache is None:
+                return 404, {"error": "aucun store configuré"}
+            # premier chargement du frame : plusieurs secondes sur un gros store, hors de la boucle
+            df = await asyncio.get_running_loop().run_in_executor(None, self.export_view, parse_qs(url.query))
+            return 200, (fmt, df)
+        if url.path == "/score":
+            if method != "POST":
+                return 405, {"error": "POST attendu"}
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                return 400, {"error": "JSON invalide"}
+            persist = parse_qs(url.query).get("persist", ["1"])[0] not in ("0", "false", "non")
+            return await self.handle_score(payload, persist)
+        return 404, {"error": "introuvable"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "requête invalide"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {"error": "Content-Length invalide"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {"error": "corps trop volumineux"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                t0 = time.perf_counter()
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except Exception as e:  # une requête en erreur ne coupe pas la connexion sans réponse
+                    print(f"erreur {method} {target} : {e!r}", file=sys.stderr)
+                    status, payload = 500, {"error": "erreur interne"}
+                if metrics.REGISTRY.enabled:
+                    metrics.observe(_route(method, target), time.perf_counter() - t0)
+                    metrics.incr(f"api.status.{status}")
+                if isinstance(payload, tuple):
+                    await self._send_export(writer, *payload, keep_alive)
+                else:
+                    await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+
+    async def _send_export(self, writer, fmt, df, keep_alive):
+        """Réponse en Transfer-Encoding chunked : un paquet de lignes (CSV) ou 1 Mo (XLSX/Parquet) à la fois."""
+        loop = asyncio.get_running_loop()
+        writer.write(
+            f"HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {MIME[fmt]}\r\n"
+            f"Content-Disposition: attachment; filename=resultats_qcm.{fmt}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+        )
+        if fmt == "csv":
+            parts = iter_csv(frame_chunks(df))
+        else:
+            f = await loop.run_in_executor(None, spooled_export, df, fmt)
+            parts = iter(lambda: f.read(1 << 20), b"")
+        while True:
+            data = await loop.run_in_executor(None, next, parts, None)
+            if not data:
+                break
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8502, store=None):
+    app = ScoringServer(store)
+    metrics.start_flusher()
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    print(f"API de notation sur http://{host}:{port} (store : {getattr(store, 'path', 'aucun')})")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="API HTTP de notation du QCM APS")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    ap.add_argument("--store", default=DEFAULT_STORE, help="store des résultats partagé avec l'UI")
+    ap.add_argument("--no-store", action="store_true", help="noter sans jamais enregistrer")
+    args = ap.parse_args(argv)
+    store = None if args.no_store else open_store(args.store)
+    try:
+        asyncio.run(serve(args.host, args.port, store))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Intervalles de confiance bootstrap des moyennes de la page Admin.
+
+Une moyenne sur 3 établissements ne se compare pas à une moyenne sur 300 :
+chaque agrégat est accompagné de son intervalle percentile (95 % par défaut)
+et de son effectif ; sous `MIN_PEERS` lignes, il est signalé comme faible.
+
+Rééchantillonnage vectorisé, sans boucle sur les tirages :
+
+- petits effectifs (n × tirages ≤ `CHUNK_CELLS`) : les indices tirés sont
+  comptés par ligne (`bincount`) en une matrice de poids tirages × lignes, et
+  toutes les moyennes sortent d'un seul produit matriciel poids · valeurs ;
+- grands effectifs : seules les moyennes par colonne sont publiées, et une
+  colonne d'indicateur n'a que quelques valeurs distinctes. Le nombre de
+  tirages de chaque valeur suit une loi multinomiale : reps × valeurs
+  distinctes au lieu de reps × n, même loi que le tirage des lignes (les
+  colonnes aux valeurs trop variées restent au tirage des lignes).
+
+Les valeurs manquantes ne comptent ni au numérateur ni au dénominateur.
+
+`segment_intervals` traite un segment par groupe (département, type…) ; au-delà
+de `PARALLEL_MIN_CELLS` cellules tirées, les segments sont répartis en paquets
+sur un pool de processus. Chaque segment a sa propre graine, dérivée de sa
+position : le résultat ne dépend pas du nombre de processus.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from qcm.rollup import MIN_PEERS
+
+REPS = 1000
+ALPHA = 0.05
+CHUNK_CELLS = 2_000_000        # poids tirés par paquet (tirages × lignes)
+PARALLEL_MIN_CELLS = 20_000_000
+DISTINCT_RATIO = 8             # tirage multinomial si valeurs distinctes × 8 ≤ n
+BATCH = 16                     # segments par tâche du pool
+
+
+def _weighted_means(values, reps, rng):
+    # tirages de lignes : poids (tirages × lignes) par bincount, moyennes par produit matriciel
+    import numpy as np
+    n = len(values)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    present = present.astype(np.float64)
+    out = np.empty((reps, values.shape[1]))
+    step = max(1, CHUNK_CELLS // n)
+    for start in range(0, reps, step):
+        c = min(step, reps - start)
+        idx = rng.integers(0, n, size=(c, n)) + (np.arange(c) * n)[:, None]
+        weights = np.bincount(idx.ravel(), minlength=c * n).reshape(c, n).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[start:start + c] = (weights @ filled) / (weights @ present)
+    return out
+
+
+def _multinomial_means(uniq, counts, reps, rng):
+    # effectifs de chaque valeur distincte dans un rééchantillon : loi multinomiale
+    import numpy as np
+    n = counts.sum()
+    draws = rng.multinomial(n, counts / n, size=reps)
+    present = ~np.isnan(uniq)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (draws[:, present] @ uniq[present]) / draws[:, present].sum(axis=1)
+
+
+def bootstrap_means(values, reps=REPS, seed=0):
+    """Moyennes rééchantillonnées : matrice reps × k pour `values` (n × k, NaN = manquant)."""
+    import numpy as np
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    rng = np.random.default_rng(seed)
+    if n * reps <= CHUNK_CELLS:
+        return _weighted_means(values, reps, rng)
+    out = np.empty((reps, values.shape[1]))
+    dense = []
+    for j in range(values.shape[1]):
+        uniq, counts = np.unique(values[:, j], return_counts=True)
+        # une valeur distincte coûte un tirage binomial, une ligne bien moins : seuil empirique
+        if len(uniq) * DISTINCT_RATIO <= n:
+            out[:, j] = _multinomial_means(uniq, counts, reps, rng)
+        else:
+            dense.append(j)
+    if dense:
+        out[:, dense] = _weighted_means(values[:, dense], reps, rng)
+    return out
+
+
+def _percentiles(boot, qs):
+    # percentiles par colonne (interpolation linéaire), NaN ignorés ; évite np.nanpercentile, lent par colonne
+    import numpy as np
+    s = np.sort(boot, axis=0)   # NaN en fin de colonne
+    m = (~np.isnan(s)).sum(axis=0)
+    cols = np.arange(s.shape[1])
+    out = []
+    for q in qs:
+        pos = q * np.maximum(m - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, np.maximum(m - 1, 0))
+        v = s[lo, cols] + (s[hi, cols] - s[lo, cols]) * (pos - lo)
+        out.append(np.where(m > 0, v, np.nan))
+    return out
+
+
+def intervals(values, reps=REPS, alpha=ALPHA, seed=0):
+    """Par colonne de `values` : dict(mean, lo, hi, n, faible). Pas d'intervalle sous 2 valeurs."""
+    import numpy as np
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    if values.shape[1] == 0:
+        return []
+    counts = (~np.isnan(values)).sum(axis=0)
+    means = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), np.nan)
+    lo = hi = np.full(values.shape[1], np.nan)
+    if len(values) >= 2:
+        lo, hi = _percentiles(bootstrap_means(values, reps, seed), (alpha / 2, 1 - alpha / 2))
+    out = []
+    for j in range(values.shape[1]):
+        n = int(counts[j])
+        ok = n >= 2
+        out.append(dict(mean=float(means[j]), lo=float(lo[j]) if ok else float("nan"),
+                        hi=float(hi[j]) if ok else float("nan"), n=n, faible=n < MIN_PEERS))
+    return out
+
+
+def frame_intervals(df, columns, reps=REPS, alpha=ALPHA, seed=0):
+    """{colonne: dict(mean, lo, hi, n, faible)} pour les colonnes présentes de `df`."""
+    columns = [c for c in columns if c in df]
+    values = df[columns].astype("float64").to_numpy()
+    return dict(zip(columns, intervals(values, reps, alpha, seed)))
+
+
+def interval_batch(items, reps, alpha):
+    """[(segment, graine, valeurs)] -> [(segment, intervalles)] ; exécuté dans un processus du pool."""
+    return [(segment, intervals(values, reps, alpha, seed)) for segment, seed, values in items]
+
+
+def segment_intervals(df, by, columns, reps=REPS, alpha=ALPHA, seed=0, workers=None):
+    """Une ligne par valeur de `by` : effectif, puis moyenne / IC bas / IC haut de chaque colonne.
+
+    `workers` : processus du pool (défaut : nombre de CPU), utilisés seulement
+    au-delà de `PARALLEL_MIN_CELLS` cellules tirées au total.
+    """
+    import numpy as np
+    import pandas as pd
+    columns = [c for c in columns if c in df]
+    values = df[columns].astype("float64").to_numpy()
+    codes, segments = pd.factorize(df[by].astype(object).fillna("Non renseigné"), sort=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(segments) + 1))
+    items = [(segments[i], np.random.SeedSequence([seed, i]), values[order[bounds[i]:bounds[i + 1]]])
+             for i in range(len(segments))]
+    workers = workers or os.cpu_count() or 1
+    batches = [items[start:start + BATCH] for start in range(0, len(items), BATCH)]
+    if workers == 1 or len(batches) <= 1 or len(values) * reps < PARALLEL_MIN_CELLS:
+        results = [r for b in batches for r in interval_batch(b, reps, alpha)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = [r for done in pool.map(interval_batch, batches, [reps] * len(batches), [alpha] * len(batches))
+                       for r in done]
+    rows = []
+    for segment, stats in results:
+        row = {by: segment, "n": stats[0]["n"] if stats else 0}
+        for col, s in zip(columns, stats):
+            row.update({col: round(s["mean"], 1), f"{col} IC bas": round(s["lo"], 1), f"{col} IC haut": round(s["hi"], 1)})
+        row["Effectif faible"] = row["n"] < MIN_PEERS
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,57 @@
+"""Graphiques Plotly du questionnaire et de la page Admin.
+
+Plotly n'est importé qu'au premier graphique (pas au démarrage de l'app).
+"""
+from qcm.metrics import timed
+from qcm.scoring import DOMAINS_ORDER
+
+@timed("charts.radar")
+def radar_chart(subs, title="Toile d’araignée – Indicateurs par domaine"):
+    import plotly.graph_objects as go
+    cats = DOMAINS_ORDER
+    vals = [subs[c] for c in cats]
+    vals.append(vals[0])  # fermeture du polygone
+    cats_loop = cats + [cats[0]]
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(r=vals, theta=cats_loop, fill='toself', name='Indicateur domaine'))
+    fig.update_layout(
+        title=title,
+        polar=dict(
+            radialaxis=dict(visible=True, range=[0,100], tickvals=[0,20,40,60,80,100])
+        ),
+        showlegend=True,
+        height=430,
+        margin=dict(l=20,r=20,t=60,b=20)
+    )
+    return fig
+
+@timed("charts.history")
+def history_chart(timeline, title="Évolution des indicateurs"):
+    """Courbes par indicateur sur les soumissions successives (lignes de `History.timeline`)."""
+    import plotly.graph_objects as go
+    x = [r["Horodatage"] for r in timeline]
+    fig = go.Figure()
+    for d in DOMAINS_ORDER:
+        fig.add_trace(go.Scatter(x=x, y=[r[f"Indic_{d}"] for r in timeline], mode='lines+markers', name=d))
+    fig.add_trace(go.Scatter(x=x, y=[r["Indicateur_global"] for r in timeline], mode='lines+markers',
+                             name="Indicateur global", line=dict(width=4)))
+    fig.update_layout(
+        title=title,
+        yaxis=dict(range=[0,100]),
+        height=400,
+        margin=dict(l=20,r=20,t=60,b=20)
+    )
+    return fig
+
+@timed("charts.heatmap")
+def heatmap_chart(matrix, title="Co-occurrences"):
+    """Carte de chaleur d'un DataFrame (lignes × colonnes), valeurs affichées dans les cases."""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Heatmap(z=matrix.to_numpy(), x=list(matrix.columns), y=list(matrix.index),
+                               colorscale="Blues", text=matrix.to_numpy(), texttemplate="%{text}"))
+    fig.update_layout(
+        title=title,
+        height=120 + 40 * len(matrix.index),
+        margin=dict(l=20,r=20,t=60,b=20)
+    )
+    return fig
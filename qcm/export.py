@@ -0,0 +1,166 @@
+"""Exports des résultats (CSV, Parquet, XLSX) générés par paquets.
+
+Chaque writer consomme un itérable de DataFrames et écrit au fil de l'eau dans
+un fichier (chemin ou objet fichier) : aucun format ne construit le document
+complet en mémoire. pyarrow (optionnel) accélère le CSV et permet le Parquet ;
+le XLSX passe par openpyxl en mode write-only, nettement plus lent (quelques
+milliers de lignes/s) : privilégier CSV/Parquet pour les gros volumes.
+"""
+import io
+import tempfile
+
+CHUNK_ROWS = 50_000
+
+MIME = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def frame_chunks(df, size=CHUNK_ROWS):
+    # colonnes category (schéma typé, qcm.schema) exportées en texte ; un frame vide
+    # donne un paquet vide (en-tête du CSV)
+    cats = {c: object for c, t in df.dtypes.items() if str(t) == "category"}
+    for start in range(0, max(len(df), 1), size):
+        chunk = df.iloc[start:start + size]
+        yield chunk.astype(cats) if cats else chunk
+
+
+def store_chunks(store, columns, where=None, size=CHUNK_ROWS):
+    """Paquets du store entier au schéma typé (qcm.schema), sans passer par un frame en mémoire.
+
+    `where(df)` : masque des lignes gardées (None = toutes les lignes) ; chaque paquet est
+    réaligné sur `columns` pour que tous aient les mêmes colonnes.
+    """
+    import pandas as pd
+    from qcm.schema import apply_schema
+    empty = True
+    for rows in store.iter_chunks(size):
+        df = apply_schema(pd.DataFrame.from_records(rows))
+        mask = where(df) if where is not None else None
+        if mask is not None:
+            df = df[mask]
+        if len(df):
+            empty = False
+            yield from frame_chunks(df.reindex(columns=columns), size)
+    if empty:
+        yield pd.DataFrame(columns=columns)   # en-tête seul
+
+
+def iter_csv(chunks):
+    """Produit le CSV (UTF-8) paquet par paquet, en-tête compris."""
+    header = True
+    arrow = has_parquet()
+    for chunk in chunks:
+        if arrow:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+            buf = io.BytesIO()
+            pacsv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), buf,
+                            pacsv.WriteOptions(include_header=header))
+            yield buf.getvalue()
+        else:
+            yield chunk.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
+
+def write_csv(chunks, f):
+    for data in iter_csv(chunks):
+        f.write(data)
+
+
+def write_xlsx(chunks, f, sheet="Résultats"):
+    """XLSX en mode write-only d'openpyxl (lignes écrites puis oubliées)."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+    header = False
+    for chunk in chunks:
+        if not header:
+            ws.append([str(c) for c in chunk.columns])
+            header = True
+        # NaN -> cellule vide
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(f)
+
+
+def has_parquet():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _arrow_schema(df):
+    # schéma fixé sur tout le frame : les colonnes texte restent du texte dans chaque paquet
+    import pyarrow as pa
+    fields = []
+    for col, dtype in df.dtypes.items():
+        kind = pa.string() if dtype == object or str(dtype) in ("str", "string", "category") else pa.from_numpy_dtype(dtype)
+        fields.append(pa.field(str(col), kind))
+    return pa.schema(fields)
+
+
+def _as_text(chunk, schema):
+    import pyarrow as pa
+    chunk = chunk.copy()
+    for field in schema:
+        if pa.types.is_string(field.type):
+            col = chunk[field.name].astype(object)
+            chunk[field.name] = col.where(col.isna(), col.astype(str)).where(col.notna(), None)
+    return chunk
+
+
+def write_parquet(chunks, f, schema=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = schema or _arrow_schema(chunk)
+                writer = pq.ParquetWriter(f, schema)
+            try:
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # colonne texte contenant des nombres (ex. import xlsx) : conversion explicite
+                table = pa.Table.from_pandas(_as_text(chunk, schema), schema=schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_chunks(chunks, fmt, f, schema=None):
+    """Écrit les paquets `chunks` (DataFrames aux mêmes colonnes) au format `fmt` dans `f`."""
+    if fmt == "csv":
+        write_csv(chunks, f)
+    elif fmt == "xlsx":
+        write_xlsx(chunks, f)
+    elif fmt == "parquet":
+        write_parquet(chunks, f, schema=schema)
+    else:
+        raise ValueError(f"Format d'export inconnu : {fmt!r}")
+
+
+def export_frame(df, fmt, f, chunk_rows=CHUNK_ROWS):
+    """Écrit `df` au format `fmt` ("csv", "xlsx", "parquet") dans `f`."""
+    export_chunks(frame_chunks(df, chunk_rows), fmt, f, schema=_arrow_schema(df) if fmt == "parquet" else None)
+
+
+def spooled_export(df, fmt, chunk_rows=CHUNK_ROWS, max_memory=32 * 1024 * 1024, chunks=None):
+    """Export dans un fichier temporaire (en mémoire jusqu'à `max_memory`, sur disque au-delà), rembobiné.
+
+    `chunks` : paquets à écrire à la place de `df` (ex. `store_chunks`), `df`
+    ne servant alors qu'au schéma Parquet.
+    """
+    f = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    if chunks is None:
+        export_frame(df, fmt, f, chunk_rows)
+    else:
+        export_chunks(chunks, fmt, f, schema=_arrow_schema(df) if fmt == "parquet" else None)
+    f.seek(0)
+    return f
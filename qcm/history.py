@@ -0,0 +1,122 @@
+"""Historique des soumissions par établissement.
+
+Les lignes du store ne sont liées entre elles que par le nom saisi librement
+(« IME RENE CARBONNEL » / « IME René Carbonnel  »). `establishment_key` en
+donne une forme normalisée ; `History` indexe les soumissions par cette clé
+dans un dict (recherche en temps constant, quel que soit le volume) et se
+synchronise par incréments sur le store, comme `Rollup`.
+"""
+import re
+import threading
+import unicodedata
+
+from qcm.metrics import timed
+from qcm.rollup import METRICS
+from qcm.rubric import LEGACY_RUBRIC, VERSION_COLUMN
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def establishment_key(nom):
+    """Identité normalisée : sans accents ni casse, ponctuation et espaces réduits.
+
+    Le département n'en fait pas partie (absent des classeurs historiques).
+    Renvoie "" pour un nom vide.
+    """
+    if nom is None or nom != nom:  # None / NaN
+        return ""
+    s = unicodedata.normalize("NFKD", str(nom))
+    s = "".join(c for c in s if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", s).strip()
+
+
+class Submission:
+    """Une soumission : horodatage, nom saisi, version du barème, indicateurs (ordre de METRICS)."""
+
+    __slots__ = ("horodatage", "nom", "version", "values")
+
+    def __init__(self, horodatage, nom, version, values):
+        self.horodatage = horodatage
+        self.nom = nom
+        self.version = version
+        self.values = values
+
+    def get(self, metric):
+        return self.values[METRICS.index(metric)]
+
+
+def deltas(previous, current):
+    """Écart indicateur par indicateur ; None si les barèmes diffèrent ou valeur manquante."""
+    if previous is None or previous.version != current.version:
+        return {m: None for m in METRICS}
+    return {m: None if a is None or b is None else round(b - a, 1)
+            for m, a, b in zip(METRICS, previous.values, current.values)}
+
+
+class History:
+    """Index clé d'établissement -> soumissions, dans l'ordre d'enregistrement."""
+
+    def __init__(self, store=None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.index = {}
+        self._cursor = None
+        self._version = None
+
+    def add_row(self, row):
+        key = establishment_key(row.get("Etablissement"))
+        if not key:
+            return
+        values = [row.get(m) for m in METRICS]
+        sub = Submission(row.get("Horodatage"), row.get("Etablissement"), row.get(VERSION_COLUMN) or LEGACY_RUBRIC,
+                         [None if v is None or v != v else float(v) for v in values])
+        self.index.setdefault(key, []).append(sub)
+
+    @timed("history.sync")
+    def sync(self):
+        """Intègre les lignes ajoutées au store depuis le dernier appel."""
+        with self._lock:
+            version = self.store.version()
+            if version == self._version:
+                return self
+            if self._version is not None and (version[0] != self._version[0] or version < self._version):
+                self._reset()
+            while True:
+                rows, self._cursor = self.store.rows_since(self._cursor, limit=50_000)
+                if not rows:
+                    break
+                for row in rows:
+                    self.add_row(row)
+            self._version = version
+        return self
+
+    def get(self, nom):
+        """Soumissions d'un établissement (nom brut ou clé), de la plus ancienne à la plus récente."""
+        return self.index.get(establishment_key(nom), [])
+
+    def last_change(self, nom):
+        """(avant-dernière soumission, deltas de la dernière) ; None s'il n'y en a qu'une."""
+        subs = self.get(nom)
+        if len(subs) < 2:
+            return None
+        return subs[-2], deltas(subs[-2], subs[-1])
+
+    def establishments(self, min_submissions=1):
+        """{clé: dernier nom saisi} des établissements ayant au moins `min_submissions` soumissions."""
+        return {k: " ".join(str(v[-1].nom).split()) for k, v in self.index.items() if len(v) >= min_submissions}
+
+    def timeline(self, nom):
+        """Lignes (dict) de l'historique avec, pour chaque indicateur, l'écart à la soumission précédente."""
+        out, prev = [], None
+        for sub in self.get(nom):
+            d = deltas(prev, sub)
+            row = {"Horodatage": sub.horodatage, "Etablissement": sub.nom, VERSION_COLUMN: sub.version}
+            for m, v in zip(METRICS, sub.values):
+                row[m] = v
+                row[f"Δ {m}"] = d[m]
+            out.append(row)
+            prev = sub
+        return out
@@ -0,0 +1,281 @@
+"""Identité des établissements : normalisation des noms et détection des doublons.
+
+    python -m qcm.identity [--store resultats_qcm.sqlite] [--threshold 0.8] [--apply]
+
+Le nom est saisi librement (formulaire, classeurs importés) : un même ESMS
+apparaît sous plusieurs orthographes. `establishment_key` (qcm.history) absorbe casse,
+accents, ponctuation et espaces ; `find_duplicates` propose ensuite des
+fusions pour les variantes restantes (fautes de frappe, mots en plus) sans
+comparer toutes les paires :
+
+- blocage par Type ; un nom sans Type ou de Type « Autre » (anciens classeurs
+  dont le nom n'a pas permis de deviner le Type, cf. `qcm.legacy.guess_type`)
+  est comparé à tous les blocs ; deux départements renseignés et différents ne
+  fusionnent jamais ;
+- index inversé sur les mots du nom et leurs variantes à une lettre près
+  (`signatures`), en ignorant les clés trop fréquentes dans le bloc (« ime »,
+  « les ») qui ne discriminent rien ;
+- score = coefficient de Dice sur les trigrammes de caractères (masques de
+  bits), calculé seulement pour les paires qui partagent une clé et de
+  longueurs compatibles.
+
+Clés et trigrammes sont calculés une fois par nom ; chaque groupe (un bloc,
+ou les noms sans Type) est indexé une seule fois.
+
+Les fusions acceptées sont gardées dans un `AliasMap` (fichier JSON à côté du
+store) et appliquées aux comptes de la page Admin.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import chain
+
+from qcm.history import establishment_key
+from qcm.storage import DEFAULT_STORE, open_store
+
+_DIGITS = re.compile(r"\d+")
+
+MATCH_THRESHOLD = 0.75   # score minimal d'une proposition de fusion
+MAX_POSTINGS = 0.02      # clé de blocage ignorée si elle couvre plus de 2 % du bloc…
+MIN_POSTINGS = 50        # …et plus de 50 noms
+UNTYPED = ("", "Autre")  # Types qui ne forment pas de bloc
+
+
+def trigrams(key):
+    s = f" {key} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+def _compatible(x, y):
+    # deux départements renseignés et différents : établissements distincts ;
+    # numéros différents (« Foyer 1 » / « Foyer 2 ») : idem
+    if x["departement"] and y["departement"] and x["departement"] != y["departement"]:
+        return False
+    return _DIGITS.findall(x["key"]) == _DIGITS.findall(y["key"])
+
+
+def signatures(key):
+    """Clés de blocage d'un nom : ses mots, et pour les mots d'au moins 5 lettres
+    chaque variante privée d'une lettre (deux mots à une faute de frappe près
+    partagent au moins une variante)."""
+    out = set()
+    for w in key.split():
+        if w.isdigit():
+            continue
+        out.add(w)
+        if len(w) >= 5:
+            out.update(w[:i] + w[i + 1:] for i in range(len(w)))
+    return out
+
+
+def _trigram_masks(keys):
+    """Trigrammes de chaque clé en masque de bits (entier) et leur nombre.
+
+    Un bit par trigramme distinct, les plus fréquents sur les bits de poids
+    faible (entiers courts) : l'intersection de deux noms est un `&` suivi d'un
+    `bit_count`, bien plus rapide qu'une intersection d'ensembles de chaînes.
+    """
+    grams = [trigrams(k) for k in keys]
+    freq = Counter(chain.from_iterable(grams))
+    bit = {g: 1 << i for i, (g, _) in enumerate(freq.most_common())}
+    return [sum(bit[g] for g in gs) for gs in grams], [len(gs) for gs in grams]
+
+
+class _Group:
+    """Noms d'un bloc (signatures et trigrammes calculés une fois par nom, cf. `find_duplicates`)
+    et index inversé clé -> positions, sans les clés trop fréquentes dans le bloc."""
+
+    def __init__(self, items, prepared):
+        self.items = items
+        self.sigs, self.masks, self.sizes = zip(*(prepared[id(it)] for it in items)) if items else ((), (), ())
+        postings = defaultdict(list)
+        for i, ss in enumerate(self.sigs):
+            for sig in ss:
+                postings[sig].append(i)
+        # clés trop fréquentes (« ime », « les », « foyer ») : elles ne discriminent rien
+        limit = max(MIN_POSTINGS, MAX_POSTINGS * len(items))
+        self.postings = {sig: ids for sig, ids in postings.items() if len(ids) <= limit}
+
+
+def _group_pairs(probe, target, threshold):
+    """Paires (i, j, score) entre les noms de `probe` et ceux de `target` (index de `target`) ;
+    i < j quand les deux groupes sont le même."""
+    same = probe is target
+    # borne de longueur : Dice >= t impose min/max >= t / (2 - t)
+    ratio = threshold / (2 - threshold)
+    postings, masks, sizes = target.postings, target.masks, target.sizes
+    for i, (ss, m, la) in enumerate(zip(probe.sigs, probe.masks, probe.sizes)):
+        lo, hi = ratio * la, la / ratio
+        candidates = set()
+        for sig in ss:
+            ids = postings.get(sig)
+            if ids is not None:
+                candidates.update(ids)
+        for j in candidates:
+            lb = sizes[j]
+            if (same and j <= i) or not lo <= lb <= hi:
+                continue
+            score = 2 * (m & masks[j]).bit_count() / (la + lb)
+            if score >= threshold and _compatible(probe.items[i], target.items[j]):
+                yield i, j, score
+
+
+def _blank(value):
+    return value is None or value != value or str(value).strip() == ""
+
+
+def identities_from_frame(df):
+    """Une entrée par clé normalisée à partir des lignes de résultats.
+
+    Regroupe d'abord les triplets (nom, Département, Type) distincts : la
+    normalisation ne porte que sur les noms uniques. Pour chaque clé, nom,
+    département et type retenus sont les plus fréquents.
+    """
+    cols = ["Etablissement", "Département", "Type"]
+    if len(df) == 0:
+        return []
+    counts = df.reindex(columns=cols).astype(object).groupby(cols, dropna=False, sort=False).size()
+    keys = {}
+    acc = defaultdict(lambda: (Counter(), Counter(), Counter()))
+    for (nom, dep, type_etab), n in counts.items():
+        if _blank(nom):
+            continue
+        k = keys.get(nom)
+        if k is None:
+            k = keys[nom] = establishment_key(nom)
+        if not k:
+            continue
+        noms, deps, types = acc[k]
+        noms[" ".join(str(nom).split())] += int(n)
+        if not _blank(dep): deps[dep] += int(n)
+        if not _blank(type_etab): types[type_etab] += int(n)
+    return [dict(key=k, nom=noms.most_common(1)[0][0],
+                 departement=deps.most_common(1)[0][0] if deps else "",
+                 type=types.most_common(1)[0][0] if types else "",
+                 submissions=sum(noms.values()))
+            for k, (noms, deps, types) in acc.items()]
+
+
+def find_duplicates(identities, threshold=MATCH_THRESHOLD):
+    """Propositions de fusion parmi `identities`.
+
+    `identities` : dicts {key, nom, departement, type, submissions} (une entrée
+    par clé normalisée, cf. `identities_from_frame`). Renvoie une liste de dicts
+    {keep, drop, nom_keep, nom_drop, score}, triée par score décroissant ;
+    `keep` est la clé la plus soumise des deux.
+    """
+    blocks = defaultdict(list)
+    untyped = []
+    named = [it for it in identities if it["key"]]
+    for it in named:
+        (untyped if it["type"] in UNTYPED else blocks[it["type"]]).append(it)
+    # signatures et trigrammes : une fois par nom, quel que soit le nombre de blocs où il est cherché
+    masks, sizes = _trigram_masks([it["key"] for it in named])
+    prepared = {id(it): (signatures(it["key"]), m, n) for it, m, n in zip(named, masks, sizes)}
+    groups = [_Group(items, prepared) for items in blocks.values()]
+    loose = _Group(untyped, prepared)
+    # sans Type ou « Autre » (anciens classeurs au nom non reconnu) : indexés une
+    # seule fois, comparés entre eux, puis les noms de chaque bloc y sont cherchés
+    runs = [(g, g) for g in groups] + [(loose, loose)] + [(g, loose) for g in groups]
+    out = []
+    for probe, target in runs:
+        for i, j, score in _group_pairs(probe, target, threshold):
+            a, b = probe.items[i], target.items[j]
+            if (b["submissions"], b["key"]) > (a["submissions"], a["key"]):
+                a, b = b, a
+            out.append(dict(keep=a["key"], drop=b["key"], nom_keep=a["nom"], nom_drop=b["nom"], score=round(score, 3)))
+    out.sort(key=lambda p: -p["score"])
+    return out
+
+
+class AliasMap:
+    """Fusions acceptées : clé -> clé canonique, persistées en JSON (écriture atomique)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.aliases = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.aliases = json.load(f)
+
+    @classmethod
+    def for_store(cls, store):
+        return cls(f"{store.path}.aliases.json" if getattr(store, "path", None) else None)
+
+    def resolve(self, key):
+        seen = set()
+        while key in self.aliases and key not in seen:
+            seen.add(key)
+            key = self.aliases[key]
+        return key
+
+    def merge(self, pairs):
+        """Applique des fusions [(keep, drop), …] puis enregistre."""
+        with self._lock:
+            for keep, drop in pairs:
+                keep, drop = self.resolve(keep), self.resolve(drop)
+                if keep != drop:
+                    self.aliases[drop] = keep
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.aliases, f, ensure_ascii=False, indent=0)
+        os.replace(tmp, self.path)
+
+    def count(self, keys):
+        """Nombre d'établissements distincts parmi `keys` une fois les fusions appliquées."""
+        if not self.aliases:
+            return len(keys)
+        return len({self.resolve(k) for k in keys})
+
+    def count_names(self, names):
+        """Idem à partir de noms bruts (une normalisation par nom distinct ; noms vides ignorés)."""
+        keys = {establishment_key(n) for n in set(names)}
+        keys.discard("")
+        return self.count(keys)
+
+    def pending(self, proposals):
+        """Propositions de `find_duplicates` pas encore fusionnées."""
+        return [p for p in proposals if self.resolve(p["keep"]) != self.resolve(p["drop"])]
+
+    def __len__(self):
+        return len(self.aliases)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Détection des doublons d'établissements dans le store des résultats")
+    ap.add_argument("--store", default=DEFAULT_STORE)
+    ap.add_argument("--threshold", type=float, default=MATCH_THRESHOLD, help="score minimal (0–1)")
+    ap.add_argument("--apply", action="store_true", help="accepte toutes les propositions")
+    args = ap.parse_args(argv)
+    store = open_store(args.store)
+    aliases = AliasMap.for_store(store)
+    t0 = time.perf_counter()
+    idents = identities_from_frame(store.to_frame())
+    proposals = aliases.pending(find_duplicates(idents, args.threshold))
+    for p in proposals:
+        print(f"{p['score']:.3f}  {p['nom_drop']}  ->  {p['nom_keep']}")
+    print(f"{len(proposals)} proposition(s) parmi {len(idents)} établissement(s) en {time.perf_counter() - t0:.1f} s",
+          file=sys.stderr)
+    if args.apply and proposals:
+        aliases.merge([(p["keep"], p["drop"]) for p in proposals])
+        print(f"{len(proposals)} fusion(s) enregistrée(s) -> {aliases.path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
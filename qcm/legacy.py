@@ -0,0 +1,223 @@
+"""Import des anciens classeurs de scores (ex. « score_total_etablissements.xlsx »).
+
+    python -m qcm.legacy "score_total_etablissements (1).xlsx" [--store resultats_qcm.sqlite] [--force]
+
+Le classeur est lu ligne à ligne (openpyxl en lecture seule), les colonnes en
+points sont traduites vers le dict `answers` du questionnaire, puis chaque paquet
+est noté avec `compute_indicators_batch` et ajouté au store : la mémoire reste
+constante quelle que soit la taille du fichier.
+
+Les informations absentes de l'ancien barème (département, objectifs, liens,
+organisme de formation…) restent vides ; le type d'établissement est déduit du
+nom quand c'est possible (« Autre » sinon).
+
+Cinq colonnes n'entrent volontairement pas dans la notation, faute d'équivalent
+dans le questionnaire ; leur valeur brute est conservée à côté de la ligne :
+
+- « Référent : Enseignant APA (3 pts) », « Référent : Éducateur sportif (2 pts) »
+  et « Référent : Autre professionnel (1 pt) » -> `Referent_APA_source`,
+  `Referent_educateur_source`, `Referent_autre_source` : le questionnaire demande
+  seulement s'il existe un référent et s'il est formé, pas sa profession ;
+- « Bonus (inscription prévue dans le futur CPOM) » -> `Bonus_CPOM_source` : le
+  questionnaire ne connaît que « APS au projet/CPOM » Oui/Non, une inscription
+  seulement prévue n'y vaut pas « Oui » ;
+- « Score sur le temps quotidien d'APS » -> `Temps_quotidien_source` : la durée
+  notée est la durée hebdomadaire, déjà reprise du score de temps hebdomadaire.
+
+Un classeur déjà importé (même `Source`, le nom du fichier) est refusé, sauf
+`force=True` (`--force`).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from qcm.metrics import timed
+from qcm.options import OPTIONS
+from qcm.rubric import CURRENT_RUBRIC, VERSION_COLUMN
+from qcm.scoring import answers_to_row, compute_indicators_batch
+from qcm.storage import DEFAULT_STORE, open_store
+
+
+def _norm(label):
+    # en-têtes tolérants : casse, apostrophes typographiques, espaces multiples
+    label = str(label or "").replace("’", "'").lower()
+    return re.sub(r"\s+", " ", label).strip()
+
+
+# Colonne du classeur -> nom interne
+LEGACY_COLUMNS = {_norm(k): v for k, v in {
+    "Classement": "classement",
+    "Nom de l'établissement": "nom",
+    "Référent Identifié (0=Non, 1=Oui)": "referent",
+    "Référent : Enseignant APA (3 pts)": "ref_apa",
+    "Référent : Éducateur sportif (2 pts)": "ref_educ",
+    "Référent : Autre professionnel (1 pt)": "ref_autre",
+    "Référent : Formation suivie (1 pt)": "formation",
+    "Encadrant : Autre professionnel (1 pt)": "enc_autre",
+    "Encadrant : Éducateur sportif (2 pts)": "enc_educ",
+    "Encadrant : Enseignant APA (3 pts)": "enc_apa",
+    "APS rég. : Base (0-2 pts)": "reg_base",
+    "APS rég. : Fréquence add. (0-5 pts)": "reg_freq",
+    "Score sur la population pratiquante": "population",
+    "Score sur le temps hebdomadaire d’APS": "hebdo",
+    "Score sur le temps quotidien d’APS": "quotidien",
+    "Score sur les APS occasionnelles": "occasionnel",
+    "Score lié au CPOM": "cpom",
+    "Bonus (inscription prévue dans le futur CPOM)": "bonus_cpom",
+    "Score final (%)": "score_final",
+}.items()}
+
+# Type d'établissement déduit du premier mot du nom
+TYPE_ALIASES = {
+    "IME": "IME", "IMPRO": "IME", "ESAT": "ESAT", "SESSAD": "SESSAD", "ITEP": "ITEP", "DITEP": "ITEP",
+    "MAS": "MAS", "FAM": "FAM", "EAM": "FAM", "IEM": "IEM", "SAMSAH": "SAMSAH", "EEAP": "EEAP",
+}
+
+
+def _pts(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _palier(options, points):
+    # score k (0, 1, 2…) -> k-ième palier de la liste d'options
+    return options[min(max(int(points), 0), len(options) - 1)]
+
+
+def guess_type(nom):
+    words = re.findall(r"\w+", nom.upper())
+    if not words:
+        return "Autre"
+    if nom.upper().startswith("MAISON D'ACCUEIL SP"):
+        return "MAS"
+    return TYPE_ALIASES.get(words[0], "Autre")
+
+
+def legacy_to_answers(rec):
+    """Ligne de l'ancien classeur (dict nom interne -> valeur) -> dict `answers`.
+
+    Conversions des points :
+
+    - référent, formation, APS occasionnelles, CPOM : points > 0 -> « Oui » ;
+    - APS rég. base 0-2 -> palier de même rang de `OPTIONS["activite_reguliere"]`
+      (0 « Non », 1 « Oui, 1 fois par semaine », 2 « Oui, plus d'une fois ») ;
+    - population k -> k-ième tranche de `OPTIONS["nb_usagers"]` (0 « 0-10% »…) ;
+    - temps hebdomadaire 0-5 -> palier de même rang de `OPTIONS["duree"]`
+      (0 « 0 min », 1 « 20 min », 2 « 30 min », 3 « 45 min », 4 « 1h », 5 « 1h30 ») ;
+    - fréquence add. 0-5 -> `freq_label` : 0 « Non précisé », 1-2 « Hebdomadaire »,
+      3-4 « Bi-hebdomadaire », 5 « Quotidien » ;
+    - encadrants : « Enseignant APA » / « Éducateur sportif » si leurs points sont > 0 ;
+      « Autre professionnel » seul -> « Aucun professionnel ».
+    """
+    nom = str(rec.get("nom") or "").strip()
+    base = _pts(rec.get("reg_base"))
+    freq = _pts(rec.get("reg_freq"))
+    encadrants = [label for key, label in (("enc_apa", "Enseignant APA"), ("enc_educ", "Éducateur sportif"))
+                  if _pts(rec.get(key)) > 0]
+    return dict(
+        nom=nom, departement=None, type_etab=guess_type(nom),
+        public=[], tranche_age=None, nb_places=None, handicaps=[],
+        referent="Oui" if _pts(rec.get("referent")) > 0 else "Non",
+        formation_referent="Oui" if _pts(rec.get("formation")) > 0 else "Non",
+        organisme="Aucun / Non précisé",
+        activite_reguliere=_palier(OPTIONS["activite_reguliere"], base),
+        nb_usagers=_palier(OPTIONS["nb_usagers"], _pts(rec.get("population"))),
+        duree=_palier(OPTIONS["duree"], _pts(rec.get("hebdo"))),
+        types_activites=[],
+        freq_label="Non précisé" if freq == 0 else "Hebdomadaire" if freq <= 2 else "Bi-hebdomadaire" if freq <= 4 else "Quotidien",
+        occasionnelle="Oui" if _pts(rec.get("occasionnel")) > 0 else "Non",
+        objectifs=[], satisfaction=[],
+        # « Autre professionnel » n'existe pas dans le questionnaire : seul -> aucun encadrant reconnu
+        encadrants=encadrants or ([] if _pts(rec.get("enc_autre")) == 0 else ["Aucun professionnel"]),
+        infrastructures=[],
+        projet_etab="Oui" if _pts(rec.get("cpom")) > 0 else "Non",
+        liens=[],
+    )
+
+
+def iter_legacy_records(path):
+    """Parcourt le classeur en streaming ; produit un dict par établissement."""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [LEGACY_COLUMNS.get(_norm(h)) for h in header]
+        if "nom" not in keys:
+            raise ValueError(f"{getattr(path, 'name', path)} : colonne « Nom de l'établissement » introuvable")
+        for values in rows:
+            rec = {k: v for k, v in zip(keys, values) if k}
+            if rec.get("nom") is None or not str(rec["nom"]).strip():
+                continue  # lignes vides en fin de feuille
+            yield rec
+    finally:
+        wb.close()
+
+
+@timed("legacy.import")
+def import_legacy(path, store, chunk_size=5_000, version=None, source=None, force=False):
+    """Importe `path` (chemin ou fichier ouvert) dans `store` par paquets ; renvoie le nombre de lignes importées.
+
+    ValueError si `source` a déjà été importé (sauf `force`).
+    """
+    import pandas as pd
+
+    version = version or CURRENT_RUBRIC
+    horodatage = datetime.now().isoformat(timespec='seconds')
+    source = source or os.path.basename(getattr(path, "name", str(path)))
+    if not force and store.has_value("Source", source):
+        raise ValueError(f"{source} a déjà été importé : ses établissements sont dans les résultats")
+    total = 0
+    chunk = []
+
+    def flush():
+        df = pd.DataFrame([answers_to_row(legacy_to_answers(r), horodatage) for r in chunk])
+        df = pd.concat([df, compute_indicators_batch(df, version)], axis=1)
+        df[VERSION_COLUMN] = version
+        df["Source"] = source
+        df["Classement_source"] = [r.get("classement") for r in chunk]
+        df["Score_source_pct"] = [r.get("score_final") for r in chunk]
+        df["Referent_APA_source"] = [r.get("ref_apa") for r in chunk]
+        df["Referent_educateur_source"] = [r.get("ref_educ") for r in chunk]
+        df["Referent_autre_source"] = [r.get("ref_autre") for r in chunk]
+        df["Bonus_CPOM_source"] = [r.get("bonus_cpom") for r in chunk]
+        df["Temps_quotidien_source"] = [r.get("quotidien") for r in chunk]
+        store.append_many(df.to_dict("records"))
+        return len(df)
+
+    for rec in iter_legacy_records(path):
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            total += flush()
+            chunk = []
+    if chunk:
+        total += flush()
+    return total
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import d'un ancien classeur de scores dans le store des résultats")
+    ap.add_argument("xlsx")
+    ap.add_argument("--store", default=DEFAULT_STORE)
+    ap.add_argument("--chunk", type=int, default=5_000)
+    ap.add_argument("--force", action="store_true", help="réimporter un classeur déjà importé")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    try:
+        n = import_legacy(args.xlsx, open_store(args.store), args.chunk, force=args.force)
+    except (FileNotFoundError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{n} établissement(s) importé(s) depuis {args.xlsx} en {time.perf_counter() - t0:.1f} s -> {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
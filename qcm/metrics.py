@@ -0,0 +1,161 @@
+"""Mesure des temps par étape (rerun Streamlit, calcul, store, figures, API).
+
+Désactivée par défaut : `timed` renvoie alors la fonction telle quelle et
+`stage` un gestionnaire de contexte vide partagé, le coût est nul ou d'un
+appel de fonction. Activation au démarrage du processus :
+
+    QCM_METRICS=1 streamlit run app.py
+    QCM_METRICS_LOG=metrics.jsonl streamlit run app.py   # + instantané JSON toutes les 60 s
+
+Chaque étape garde un histogramme à seaux fixes (log, 4 par décade, de 1 µs à
+100 s) et les 2048 dernières mesures pour les percentiles récents
+(p50/p95/p99). Lecture : `snapshot()` (page Admin avec `?debug=metrics`,
+`GET /metrics` de l'API) ou le fichier de `QCM_METRICS_LOG`.
+"""
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+LOG_PATH = os.environ.get("QCM_METRICS_LOG") or None
+ENABLED = bool(LOG_PATH) or os.environ.get("QCM_METRICS", "") not in ("", "0")
+FLUSH_INTERVAL = 60.0
+RECENT = 2048
+BUCKETS = tuple(10 ** (e / 4) for e in range(-24, 9))   # secondes : 1 µs … 100 s
+
+_NOOP = contextlib.nullcontext()
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Histogram:
+    """Latences d'une étape : seaux cumulables, total, et mesures récentes."""
+
+    __slots__ = ("counts", "count", "total", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # dernier seau : au-delà de 100 s
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else float("nan"),
+            "p50_ms": _percentile(recent, 50) * 1000,
+            "p95_ms": _percentile(recent, 95) * 1000,
+            "p99_ms": _percentile(recent, 99) * 1000,
+        }
+
+
+class _Stage:
+    __slots__ = ("registry", "name", "t0")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Registry:
+    """Histogrammes et compteurs d'un processus."""
+
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(seconds)
+
+    def incr(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage(self, name):
+        """`with registry.stage("nom"):` chronomètre le bloc (rien si désactivé)."""
+        return _Stage(self, name) if self.enabled else _NOOP
+
+    def timed(self, name):
+        """Décorateur : chronomètre chaque appel ; fonction inchangée si désactivé."""
+        def deco(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - t0)
+            return wrapper
+        return deco
+
+    def snapshot(self):
+        """{"stages": {étape: count, mean/p50/p95/p99 en ms}, "counters": {...}} à l'instant t."""
+        with self._lock:
+            stages = {name: h.summary() for name, h in sorted(self.histograms.items())}
+            buckets = {name: list(h.counts) for name, h in self.histograms.items()}
+            counters = dict(sorted(self.counters.items()))
+        return {"time": time.time(), "uptime_s": time.time() - self.started, "pid": os.getpid(),
+                "stages": stages, "buckets": buckets, "counters": counters}
+
+    def start_flusher(self, path=LOG_PATH, interval=FLUSH_INTERVAL):
+        """Écrit un instantané JSON par ligne dans `path` toutes les `interval` secondes (une fois par processus)."""
+        if not (self.enabled and path) or self._flusher is not None:
+            return
+        def loop():
+            while True:
+                time.sleep(interval)
+                line = json.dumps(self.snapshot(), ensure_ascii=False)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        self._flusher = threading.Thread(target=loop, name="qcm-metrics-flush", daemon=True)
+        self._flusher.start()
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+incr = REGISTRY.incr
+stage = REGISTRY.stage
+timed = REGISTRY.timed
+snapshot = REGISTRY.snapshot
+start_flusher = REGISTRY.start_flusher
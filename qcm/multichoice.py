@@ -0,0 +1,88 @@
+"""Réponses à choix multiples encodées en masques de bits.
+
+Chaque champ de `MULTI_FIELDS` a un vocabulaire fixe (`OPTIONS[champ]`) : le
+bit i correspond à la i-ème option. Les lignes enregistrées gardent la chaîne
+jointe par ";" (lisible, exports) et portent en plus une colonne
+`<Colonne>_mask` (entier). Les analyses de la page Admin travaillent sur ces
+entiers, par opérations bit à bit sur tout le jeu de données, sans découper de
+chaînes ligne par ligne.
+
+Une nouvelle option doit être ajoutée en fin de liste : les masques déjà
+enregistrés restent valides. Les valeurs hors vocabulaire sont ignorées.
+"""
+from qcm.options import MULTI_FIELDS, OPTIONS
+
+MASK_SUFFIX = "_mask"
+_BITS = {f: {opt: 1 << i for i, opt in enumerate(OPTIONS[f])} for f in MULTI_FIELDS}
+
+
+def mask_column(column):
+    return column + MASK_SUFFIX
+
+
+def encode(field, values):
+    """Liste d'options (ou chaîne jointe par ";") -> masque entier."""
+    if isinstance(values, str):
+        values = values.split(";") if values else []
+    bits = _BITS[field]
+    m = 0
+    for v in values or ():
+        m |= bits.get(v, 0)
+    return m
+
+
+def _column(field):
+    from qcm.scoring import ANSWER_COLUMNS
+    return ANSWER_COLUMNS[field]
+
+
+def masks(df, field):
+    """Masques du champ pour chaque ligne de `df` (np.int64).
+
+    Lit la colonne `<Colonne>_mask` ; les lignes qui n'en ont pas (résultats
+    antérieurs à l'encodage) sont encodées une fois par chaîne distincte.
+    """
+    import numpy as np
+    import pandas as pd
+    col = _column(field)
+    out = np.zeros(len(df), dtype=np.int64)
+    stored = pd.to_numeric(df[mask_column(col)], errors="coerce") if mask_column(col) in df else pd.Series(np.nan, index=df.index)
+    known = stored.notna().to_numpy()
+    out[known] = stored[known].to_numpy(dtype=np.int64)
+    if col in df and not known.all():
+        codes, uniques = pd.factorize(df[col][~known])
+        table = np.array([encode(field, u if isinstance(u, str) else None) for u in uniques] + [0], dtype=np.int64)
+        out[~known] = table[codes]
+    return out
+
+
+def bit_matrix(m, field):
+    """Matrice booléenne lignes × options d'un vecteur de masques."""
+    import numpy as np
+    shifts = np.arange(len(OPTIONS[field]), dtype=np.int64)
+    return ((m[:, None] >> shifts) & 1).astype(bool)
+
+
+def share_by(df, field, by="Type"):
+    """Part (%) des lignes citant chaque option, par valeur de `by` (+ colonne « Lignes »)."""
+    import numpy as np
+    import pandas as pd
+    bits = bit_matrix(masks(df, field), field)
+    groups = df[by].astype(object).fillna("Non renseigné").to_numpy() if by in df else np.full(len(df), "Tous")
+    frame = pd.DataFrame(bits, columns=OPTIONS[field]).assign(**{by: groups})
+    grouped = frame.groupby(by, sort=True)
+    out = (grouped[OPTIONS[field]].mean() * 100).round(1)
+    out.insert(0, "Lignes", grouped.size())
+    return out
+
+
+def cooccurrence(df, field_a="freins", field_b="actions_existantes"):
+    """Nombre de lignes citant à la fois l'option a (lignes) et l'option b (colonnes).
+
+    Produit matriciel des matrices de bits (n × ka)ᵀ · (n × kb) : une seule
+    passe sur tout le jeu de données.
+    """
+    import pandas as pd
+    a = bit_matrix(masks(df, field_a), field_a).astype("int64")
+    b = bit_matrix(masks(df, field_b), field_b).astype("int64")
+    return pd.DataFrame(a.T @ b, index=OPTIONS[field_a], columns=OPTIONS[field_b])
@@ -0,0 +1,34 @@
+"""Listes d'options du formulaire (source unique pour l'UI, les calculs en lot et les générateurs)."""
+
+OUI_NON = ["Oui", "Non"]
+
+# Clés = clés du dict `answers` construit par le questionnaire
+OPTIONS = {
+    "departement": ["02 - Aisne", "59 - Nord", "60 - Oise", "62 - Pas-de-Calais", "80 - Somme"],
+    "type_etab": ["ESAT", "IME", "ITEP", "FAM", "MAS", "SAMSAH", "SESSAD", "EEAP", "IEM", "Autre"],
+    "tranche_age": ["Enfants", "Adultes", "Mixte"],
+    "public": ["Enfant", "Adulte"],
+    "handicaps": ["Déficience intellectuelle", "Handicap psychique", "Troubles du neurodéveloppement", "Polyhandicap", "Autre"],
+    "referent": OUI_NON,
+    "formation_referent": OUI_NON,
+    "organisme": ["Aucun / Non précisé", "LSAHF", "Fédération Handisport", "Université (APAS)", "ARS / DRJSCS", "Autre"],
+    "activite_reguliere": ["Non", "Oui, 1 fois par semaine", "Oui, plus d'une fois"],
+    "nb_usagers": ["0-10%", "10-20%", "20-30%", "30-40%", "40-50%", "50-60%", "60-70%", "70-80%", "80-90%", "90-100%"],
+    "duree": ["0 min", "20 min", "30 min", "45 min", "1h", "1h30", "2h", "2h30"],
+    "types_activites": ["Individuelle", "Collective", "Opposition", "Artistique", "Pleine nature"],
+    "freq_label": ["Non précisé", "Hebdomadaire", "Bi-hebdomadaire", "Quotidien"],
+    "occasionnelle": OUI_NON,
+    "objectifs": ["Thérapeutique", "Occupationnel", "Maintien des capacités physiques", "Développement physique",
+                  "Habiletés sociales", "Capacités cognitives", "Autonomie", "Bien-être"],
+    "satisfaction": ["Vouloir plus d’APS", "Être satisfaits", "Ne pas être satisfaits", "Trop d’APS"],
+    "encadrants": ["Enseignant APA", "Éducateur sportif", "Aucun professionnel"],
+    "infrastructures": ["Gymnase interne", "Salle polyvalente", "Espace extérieur", "À l’extérieur", "Non concerné"],
+    "projet_etab": OUI_NON,
+    "liens": ["Clubs adaptés", "Clubs ordinaires", "Mairie", "Ligues", "Maisons sport-santé", "Autres ESMS", "Aucun"],
+    "actions_existantes": ["Recrutement", "Achat matériel", "Création de séances", "Lieu dédié", "Sorties", "Partenariat clubs"],
+    "freins": ["Moyens humains", "Moyens matériels", "Lieu", "Manque de contacts", "Absence clubs", "Temps", "Manque info"],
+}
+
+# Champs à choix multiples (listes dans `answers`, chaînes jointes par ";" une fois enregistrées)
+MULTI_FIELDS = ["public", "handicaps", "types_activites", "objectifs", "satisfaction", "encadrants",
+                "infrastructures", "liens", "actions_existantes", "freins"]
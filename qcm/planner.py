@@ -0,0 +1,167 @@
+"""Pistes d'amélioration : quelles réponses changer pour gagner le plus de points.
+
+À partir des réponses d'un établissement, on énumère toutes les modifications
+possibles dans les listes du formulaire (une option pour un choix simple, un
+palier de plus ou de moins pour une échelle ordonnée, un ajout ou un retrait
+pour un choix multiple), seules puis deux à deux quand elles interagissent,
+et on les classe par gain d'Indicateur_global avec le barème courant.
+
+Évaluation mémoïsée par domaine : un sous-indicateur ne dépend que des champs
+de `DOMAIN_FIELDS[domaine]`. Pour chaque candidat, seuls les domaines touchés
+sont recherchés dans le cache (clé = valeurs de leurs champs) ;
+`compute_indicators` n'est appelé que pour une combinaison encore jamais vue.
+Un bon millier de candidats se notent ainsi en une vingtaine de millisecondes.
+"""
+from itertools import combinations
+
+from qcm.options import MULTI_FIELDS, OPTIONS
+from qcm.scoring import DOMAIN_FIELDS, DOMAINS_ORDER, compute_indicators, global_indicator
+
+# la perception des usagers se constate, elle ne se décide pas
+ACTIONABLE = [f for d in DOMAINS_ORDER for f in DOMAIN_FIELDS[d] if f != "satisfaction"]
+FIELD_DOMAINS = {f: [d for d in DOMAINS_ORDER if f in DOMAIN_FIELDS[d]] for f in ACTIONABLE}
+# échelles ordonnées : on ne propose que le palier voisin (« une tranche de plus »)
+ORDERED = ("activite_reguliere", "nb_usagers", "duree")
+FIELD_LABELS = {
+    "referent": "Référent APS", "formation_referent": "Formation du référent", "organisme": "Organisme de formation",
+    "activite_reguliere": "APS régulières", "nb_usagers": "Part d’usagers concernés", "duree": "Durée hebdo",
+    "types_activites": "Types d’APS réguliers", "occasionnelle": "APS occasionnelles",
+    "encadrants": "Encadrants", "projet_etab": "APS au projet/CPOM", "liens": "Partenaires",
+    "objectifs": "Objectifs",
+}
+
+
+class Change:
+    """Une modification : nouvelle valeur d'un choix simple, ou ajout/retrait d'une option."""
+
+    __slots__ = ("field", "op", "value")
+
+    def __init__(self, field, op, value):
+        self.field, self.op, self.value = field, op, value
+
+    def new_value(self, current):
+        """Valeur du champ après la modification, à partir de sa valeur `current`."""
+        if self.op == "set":
+            return self.value
+        if self.op == "add":
+            return list(current or []) + [self.value]
+        return [v for v in current or [] if v != self.value]
+
+    def label(self, answers):
+        name = FIELD_LABELS.get(self.field, self.field)
+        if self.op == "set":
+            return f"{name} : {answers.get(self.field)} → {self.value}"
+        return f"{name} : {'ajouter' if self.op == 'add' else 'retirer'} « {self.value} »"
+
+
+def single_changes(answers):
+    """Toutes les modifications d'une seule réponse possibles dans les listes du formulaire."""
+    out = []
+    for field in ACTIONABLE:
+        current = answers.get(field)
+        if field in MULTI_FIELDS:
+            current = current or []
+            out += [Change(field, "remove" if opt in current else "add", opt) for opt in OPTIONS[field]]
+        elif field in ORDERED and current in OPTIONS[field]:
+            i = OPTIONS[field].index(current)
+            out += [Change(field, "set", OPTIONS[field][j]) for j in (i - 1, i + 1) if 0 <= j < len(OPTIONS[field])]
+        else:
+            out += [Change(field, "set", opt) for opt in OPTIONS[field] if opt != current]
+    return out
+
+
+def _compatible(a, b):
+    # deux valeurs pour le même choix simple, ou deux fois la même option : exclus
+    if a.field != b.field:
+        return True
+    return a.field in MULTI_FIELDS and a.value != b.value
+
+
+def _freeze(value):
+    return tuple(sorted(value)) if isinstance(value, (list, tuple)) else value
+
+
+class Planner:
+    """Évalue des jeux de modifications sur les réponses d'un établissement (cache par domaine)."""
+
+    def __init__(self, answers, version=None):
+        self.answers = {**{k: [] for k in MULTI_FIELDS}, **answers}
+        self.version = version
+        self._memo = {}
+        self._frozen = {f: _freeze(self.answers.get(f)) for d in DOMAINS_ORDER for f in DOMAIN_FIELDS[d]}
+        self.base_subs, self.base_global = compute_indicators(self.answers, version)
+        self.evaluated = 0
+        self.computed = 0
+
+    def _key(self, domain, changed):
+        return (domain,) + tuple(_freeze(changed[f]) if f in changed else self._frozen[f] for f in DOMAIN_FIELDS[domain])
+
+    def evaluate(self, changes):
+        """(sous-indicateurs, indicateur global) après application de `changes`."""
+        self.evaluated += 1
+        changed = {}
+        for c in changes:
+            changed[c.field] = c.new_value(changed.get(c.field, self.answers.get(c.field)))
+        keys = {d: self._key(d, changed) for f in changed for d in FIELD_DOMAINS[f]}
+        if any(k not in self._memo for k in keys.values()):
+            self.computed += 1
+            full, _ = compute_indicators({**self.answers, **changed}, self.version)
+            for d, k in keys.items():
+                self._memo[k] = full[d]
+        subs = dict(self.base_subs)
+        for d, k in keys.items():
+            subs[d] = self._memo[k]
+        return subs, global_indicator(subs, self.version)
+
+    def plan(self, pairs=True, top=None):
+        """Modifications (seules puis par deux) classées par gain d'indicateur global décroissant.
+
+        Une paire n'est gardée que si ses deux modifications interagissent, c.-à-d.
+        si elle rapporte plus que la somme de leurs gains seules (ex. ajouter
+        « Enseignant APA » et retirer « Aucun professionnel ») ; sinon les
+        modifications seules suffisent. Une même modification n'apparaît que dans
+        une piste (la mieux classée), et parmi les pistes de même gain portant sur
+        les mêmes champs, seule la première est gardée. Renvoie des dicts {changes,
+        labels, gain, indicateur_global, domains}.
+        """
+        singles = single_changes(self.answers)
+        gains = {}
+        out = []
+        for c in singles:
+            subs, g = self.evaluate([c])
+            gains[c] = g - self.base_global
+            out.append(self._result([c], subs, g))
+        if pairs:
+            for a, b in combinations(singles, 2):
+                if not _compatible(a, b):
+                    continue
+                subs, g = self.evaluate([a, b])
+                if g - self.base_global > gains[a] + gains[b] + 1e-9:
+                    out.append(self._result([a, b], subs, g))
+        out.sort(key=lambda r: (-r["gain"], len(r["changes"])))
+        # options interchangeables (n'importe quel partenaire, organisme…) : une seule piste
+        # par gain et par type de modification
+        seen = set()
+        used = set()
+        kept = []
+        for r in out:
+            shape = (r["gain"],) + tuple(sorted((c.field, c.op) for c in r["changes"]))
+            if r["gain"] > 0 and shape not in seen and not used.intersection(r["changes"]):
+                seen.add(shape)
+                used.update(r["changes"])
+                kept.append(r)
+        return kept[:top] if top else kept
+
+    def _result(self, changes, subs, g):
+        return {
+            "changes": changes,
+            "labels": [c.label(self.answers) for c in changes],
+            "gain": round(g - self.base_global, 1),
+            "indicateur_global": g,
+            "domains": [d for d in DOMAINS_ORDER if subs[d] != self.base_subs[d]],
+        }
+
+
+def plan_improvements(answers, top=5, pairs=True, version=None):
+    """Les `top` meilleures pistes d'amélioration pour `answers` (cf. `Planner.plan`)."""
+    return Planner(answers, version).plan(pairs=pairs, top=top)
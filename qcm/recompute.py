@@ -0,0 +1,67 @@
+"""Recalcul des résultats enregistrés avec une version du barème.
+
+    python -m qcm.recompute --out resultats_v2.sqlite --version v2
+
+Les réponses brutes sont relues par paquets depuis le store source, notées avec
+`compute_indicators_batch` et écrites dans un nouveau store (le store source,
+en ajout seul, n'est pas modifié). Aucune dépendance à Streamlit.
+
+L'application lit le store désigné par `QCM_RESULTS_STORE` (défaut
+resultats_qcm.sqlite) : pour qu'elle affiche les résultats recalculés, la
+relancer avec cette variable pointant sur le nouveau store, ex.
+
+    QCM_RESULTS_STORE=resultats_v2.sqlite streamlit run app.py
+"""
+import argparse
+import os
+import sys
+import time
+
+from qcm.rubric import CURRENT_RUBRIC, VERSION_COLUMN, get_rubric
+from qcm.scoring import ANSWER_COLUMNS, compute_indicators_batch
+from qcm.storage import DEFAULT_STORE, open_store
+
+
+def recompute(src, dst, version=None, chunk_size=50_000):
+    """Recalcule tout `src` vers `dst` ; renvoie le nombre de lignes écrites."""
+    import pandas as pd
+
+    version = version or CURRENT_RUBRIC
+    get_rubric(version)  # version inconnue -> ValueError avant toute écriture
+    if not dst.is_empty():
+        raise ValueError(f"Le store de destination {dst.path} n'est pas vide")
+    total = 0
+    for rows in src.iter_chunks(chunk_size):
+        df = pd.DataFrame.from_records(rows)
+        # lignes incomplètes (anciens imports) : colonnes de réponses absentes -> vides
+        df = df.reindex(columns=list(dict.fromkeys([*df.columns, *ANSWER_COLUMNS.values()])))
+        scores = compute_indicators_batch(df, version)
+        df[list(scores.columns)] = scores
+        df[VERSION_COLUMN] = version
+        dst.append_many(df.to_dict("records"))
+        total += len(df)
+    return total
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--store", default=DEFAULT_STORE, help="store source (.sqlite ou .jsonl)")
+    ap.add_argument("--out", required=True, help="store de destination (doit être vide)")
+    ap.add_argument("--version", default=CURRENT_RUBRIC, help="version du barème (qcm/rubric.py)")
+    ap.add_argument("--chunk", type=int, default=50_000, help="taille des paquets")
+    args = ap.parse_args(argv)
+
+    if os.path.abspath(args.store) == os.path.abspath(args.out):
+        ap.error("--out doit être différent de --store")
+    t0 = time.perf_counter()
+    try:
+        n = recompute(open_store(args.store), open_store(args.out), args.version, args.chunk)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{n} ligne(s) recalculée(s) avec le barème {args.version} en {time.perf_counter() - t0:.1f} s -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
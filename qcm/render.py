@@ -0,0 +1,69 @@
+"""Cache de rendu partagé entre reruns (figures Plotly, fragments HTML).
+
+Les clés sont construites à partir du vecteur des sous-indicateurs arrondi au
+dixième et du titre : deux établissements aux mêmes scores partagent la même
+figure. Éviction LRU au-delà de `maxsize` entrées. Chaque entrée garde son
+coût de construction, ce qui permet d'estimer le temps économisé sur un hit.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from qcm.scoring import DOMAINS_ORDER
+
+
+def subs_key(subs):
+    return tuple(round(float(subs[d]), 1) for d in DOMAINS_ORDER)
+
+
+class RenderStats:
+    """Compteurs d'un rendu de page (un rerun Streamlit)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0    # secondes économisées (coût des entrées réutilisées)
+        self.spent = 0.0    # secondes passées à construire les entrées manquantes
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class RenderCache:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.totals = RenderStats()
+
+    def get(self, key, build, stats=None):
+        """Valeur en cache pour `key`, sinon `build()` (chronométré) puis mise en cache."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is not None:
+            value, cost = entry
+            for s in (self.totals, stats):
+                if s is not None:
+                    s.hits += 1
+                    s.saved += cost
+            return value
+        t0 = time.perf_counter()
+        value = build()
+        cost = time.perf_counter() - t0
+        with self._lock:
+            self._data[key] = (value, cost)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        for s in (self.totals, stats):
+            if s is not None:
+                s.misses += 1
+                s.spent += cost
+        return value
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,195 @@
+"""Rapports HTML par établissement (campagne régionale), hors Streamlit.
+
+    python -m qcm.reports --out rapports/ [--zip rapports.zip] [--workers 8] [--store resultats_qcm.sqlite]
+
+Un rapport par établissement (dernière soumission, doublons fusionnés via
+`AliasMap`) : indicateur global, radar, détail par domaine et recommandations
+(`radar_chart` et `recommandations`, comme sur la page Questionnaire).
+
+Les ressources communes ne sont produites qu'une fois : plotly.min.js est
+écrit à côté des rapports (le dossier ou le ZIP s'ouvre hors ligne), et chaque
+processus sérialise la figure radar une seule fois puis n'y remplace que les
+valeurs et le titre. Le rendu est réparti par paquets sur un pool de processus.
+"""
+import argparse
+import copy
+import html
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from qcm.history import establishment_key
+from qcm.identity import AliasMap
+from qcm.rubric import VERSION_COLUMN
+from qcm.scoring import DOMAINS_ORDER, recommandations
+from qcm.storage import DEFAULT_STORE, open_store
+
+PLOTLY_JS = "plotly.min.js"
+BATCH = 50
+
+REPORT_CSS = """
+body{font-family:system-ui,-apple-system,"Segoe UI",Roboto,sans-serif;color:#2c3e50;background:#f5f7fb;margin:0;padding:24px;}
+.wrap{max-width:960px;margin:auto;}
+.card{background:#fff;border-radius:16px;padding:16px 18px;box-shadow:0 4px 18px rgba(0,0,0,.06);margin:10px 0;}
+.small{font-size:.9rem;color:#5f6c7b;}
+.progress-wrap{width:100%;background:#ecf0f1;border-radius:14px;height:28px;overflow:hidden;}
+.progress-bar{height:28px;border-radius:14px;display:flex;align-items:center;justify-content:center;color:#fff;font-weight:700;}
+.domains{display:grid;grid-template-columns:repeat(auto-fill,minmax(200px,1fr));gap:8px;}
+"""
+
+
+def color_for_score(s):
+    if s < 40: return "#e74c3c"
+    if s < 70: return "#f39c12"
+    return "#2ecc71"
+
+
+def latest_by_establishment(store, aliases=None):
+    """Dernière soumission notée de chaque établissement (clé normalisée, fusions appliquées)."""
+    aliases = aliases or AliasMap()
+    latest = {}
+    for rows in store.iter_chunks():
+        for row in rows:
+            key = establishment_key(row.get("Etablissement"))
+            if key and row.get("Indicateur_global") is not None:
+                latest[aliases.resolve(key)] = row
+    return latest
+
+
+def report_filename(key):
+    return re.sub(r"[^0-9a-z]+", "_", key)[:120] + ".html"
+
+
+_radar_template = None
+
+
+def _radar_json(subs, title):
+    # figure construite et sérialisée une fois par processus ; ensuite on ne
+    # remplace que les valeurs et le titre
+    global _radar_template
+    if _radar_template is None:
+        import plotly.io as pio
+        from qcm.charts import radar_chart
+        _radar_template = json.loads(pio.to_json(radar_chart({d: 0 for d in DOMAINS_ORDER}), validate=False))
+    fig = copy.deepcopy(_radar_template)
+    vals = [subs[d] for d in DOMAINS_ORDER]
+    fig["data"][0]["r"] = vals + vals[:1]
+    fig["layout"]["title"]["text"] = title
+    return json.dumps(fig["data"]), json.dumps(fig["layout"])
+
+
+def _md(line):
+    # recommandations : seul le gras markdown est utilisé
+    return re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", html.escape(line))
+
+
+def render_report(row, plotly_src=PLOTLY_JS):
+    """Page HTML d'une ligne de résultats (radar, domaines, recommandations)."""
+    subs = {d: float(row.get(f"Indic_{d}") or 0) for d in DOMAINS_ORDER}
+    g = float(row["Indicateur_global"])
+    nom = html.escape(" ".join(str(row.get("Etablissement")).split()))
+    meta = " · ".join(html.escape(str(row[c])) for c in ("Département", "Type", "Tranche_age") if row.get(c))
+    data, layout = _radar_json(subs, "Indicateurs par domaine (0–100)")
+    domains = "".join(f"<div class='card'><b>{d}</b> — <b style='color:{color_for_score(subs[d])}'>{subs[d]}/100</b></div>"
+                      for d in DOMAINS_ORDER)
+    recos = "".join(f"<li>{_md(line)}</li>" for line in recommandations(subs))
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>Rapport APS — {nom}</title>
+<script src="{plotly_src}"></script><style>{REPORT_CSS}</style></head>
+<body><div class="wrap">
+<div class="card"><h1>{nom}</h1><div class="small">{meta}</div>
+<div class="small">Soumission du {html.escape(str(row.get("Horodatage") or ""))} — barème {html.escape(str(row.get(VERSION_COLUMN) or ""))}</div></div>
+<div class="card"><h2>📈 Indicateur global : <span style="color:{color_for_score(g)}">{g}/100</span></h2>
+<div class="progress-wrap"><div class="progress-bar" style="width:{g}%;background:{color_for_score(g)}">{g}%</div></div></div>
+<div class="card"><div id="radar"></div></div>
+<script>Plotly.newPlot("radar", {data}, {layout}, {{"displayModeBar": false, "responsive": true}});</script>
+<h2>🔎 Détail des indicateurs par domaine</h2><div class="domains">{domains}</div>
+<div class="card"><h2>🤝 Messages d’accompagnement et conseils</h2><ul>{recos}</ul></div>
+</div></body></html>
+"""
+
+
+def render_batch(items):
+    """[(clé, ligne)] -> [(nom de fichier, html)] ; exécuté dans un processus du pool."""
+    return [(report_filename(key), render_report(row)) for key, row in items]
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def generate_reports(store, out=None, zip_path=None, workers=None, batch=BATCH, aliases=None):
+    """Écrit un rapport par établissement dans `out` et/ou `zip_path` ; renvoie le nombre de rapports."""
+    from plotly.offline import get_plotlyjs
+
+    items = sorted(latest_by_establishment(store, aliases).items())
+    workers = workers or os.cpu_count() or 1
+    sinks = []
+    if out:
+        os.makedirs(out, exist_ok=True)
+        sinks.append(lambda name, data: _write(os.path.join(out, name), data))
+    zf = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) if zip_path else None
+    if zf:
+        sinks.append(zf.writestr)
+    try:
+        # ressource commune : une seule copie de plotly.js pour tous les rapports
+        js = get_plotlyjs()
+        for sink in sinks:
+            sink(PLOTLY_JS, js)
+        chunks = list(_batches(items, batch))
+        if workers == 1 or len(chunks) <= 1:
+            results = map(render_batch, chunks)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(render_batch, chunks)
+        try:
+            for rendered in results:
+                for name, page in rendered:
+                    for sink in sinks:
+                        sink(name, page)
+        finally:
+            if pool:
+                pool.shutdown()
+        index = "".join(f"<li><a href='{report_filename(k)}'>{html.escape(' '.join(str(r.get('Etablissement')).split()))}</a></li>"
+                        for k, r in items)
+        for sink in sinks:
+            sink("index.html", f"<!DOCTYPE html><html lang='fr'><head><meta charset='utf-8'><title>Rapports APS</title></head>"
+                               f"<body><h1>Rapports APS ({len(items)})</h1><ul>{index}</ul></body></html>")
+    finally:
+        if zf:
+            zf.close()
+    return len(items)
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rapports HTML par établissement à partir du store des résultats")
+    ap.add_argument("--store", default=DEFAULT_STORE)
+    ap.add_argument("--out", help="dossier de sortie")
+    ap.add_argument("--zip", help="archive ZIP de sortie")
+    ap.add_argument("--workers", type=int, default=None, help="processus (défaut : nombre de CPU)")
+    ap.add_argument("--batch", type=int, default=BATCH, help="rapports par tâche du pool")
+    args = ap.parse_args(argv)
+    if not args.out and not args.zip:
+        ap.error("--out et/ou --zip requis")
+    store = open_store(args.store)
+    t0 = time.perf_counter()
+    n = generate_reports(store, args.out, args.zip, args.workers, args.batch, AliasMap.for_store(store))
+    dt = time.perf_counter() - t0
+    print(f"{n} rapport(s) en {dt:.1f} s ({n / dt if dt else 0:,.0f} rapports/s) -> "
+          + " + ".join(p for p in (args.out, args.zip) if p))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
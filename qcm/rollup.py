@@ -0,0 +1,223 @@
+"""Agrégats pré-calculés pour la page Admin.
+
+Pour chaque cellule (version du barème, Département, Type, Tranche_age) on garde
+le nombre de lignes et, par indicateur, count / somme / somme des carrés. Les
+combinaisons avec « Tous » sont matérialisées à l'insertion (8 clés par ligne) :
+une combinaison de filtres se lit donc en une seule recherche dans un dict.
+
+Pour le classement entre pairs, chaque niveau de `PEER_LEVELS` garde en plus
+les valeurs triées de chaque indicateur (`array('d')`) : rang par dichotomie
+en O(log n). Les quelques lignes d'une soumission sont insérées par `insort` ;
+le chargement initial (ou un gros import) est fusionné en un seul tri par clé.
+"""
+import itertools
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from qcm.metrics import timed
+from qcm.rubric import LEGACY_RUBRIC, VERSION_COLUMN
+from qcm.scoring import DOMAINS_ORDER
+
+ALL = "Tous"
+SEGMENT_COLUMNS = ["Département", "Type", "Tranche_age"]
+METRICS = [f"Indic_{d}" for d in DOMAINS_ORDER] + ["Indicateur_global"]
+# segments de comparaison, du plus fin au plus large (colonnes conservées)
+PEER_LEVELS = ((True, True, True), (False, True, True), (False, True, False), (False, False, False))
+MIN_PEERS = 5
+INSORT_MAX = 2_000   # au-delà, un paquet de nouvelles lignes est fusionné par tri plutôt qu'inséré ligne à ligne
+
+
+class Stats:
+    """Agrégat d'une cellule : n lignes, et count / somme / somme des carrés par indicateur."""
+
+    __slots__ = ("rows", "count", "total", "total_sq")
+
+    def __init__(self):
+        self.rows = 0
+        self.count = [0] * len(METRICS)
+        self.total = [0.0] * len(METRICS)
+        self.total_sq = [0.0] * len(METRICS)
+
+    def _add(self, rows, count, total, total_sq):
+        self.rows += rows
+        for i in range(len(METRICS)):
+            self.count[i] += count[i]
+            self.total[i] += total[i]
+            self.total_sq[i] += total_sq[i]
+
+    def mean(self, metric):
+        i = METRICS.index(metric)
+        return self.total[i] / self.count[i] if self.count[i] else float("nan")
+
+
+def _keys(version, dep, type_etab, age):
+    # la cellule exacte et toutes ses généralisations par « Tous »
+    for mask in itertools.product((False, True), repeat=3):
+        yield (version,) + tuple(ALL if m else v for m, v in zip(mask, (dep, type_etab, age)))
+
+
+def _peer_keys(version, dep, type_etab, age):
+    for keep in PEER_LEVELS:
+        yield (version,) + tuple(v if k else ALL for k, v in zip(keep, (dep, type_etab, age)))
+
+
+def _number(v):
+    # valeur d'indicateur d'une ligne du store -> float, None si absente, NaN ou non numérique
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if v == v else None
+
+
+def _segment(seg):
+    return tuple(None if (isinstance(x, float) and x != x) else x for x in seg)
+
+
+class Rollup:
+    """Agrégats synchronisés par incréments sur un store de résultats."""
+
+    def __init__(self, store=None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.cells = {}
+        self.dist = {}    # clé de PEER_LEVELS -> une array('d') triée par indicateur
+        self.values = {c: set() for c in SEGMENT_COLUMNS}   # options des filtres
+        self.versions = set()
+        self._cursor = None
+        self._version = None
+
+    def _add(self, segment, rows, count, total, total_sq):
+        version, dep, type_etab, age = segment
+        self.versions.add(version)
+        for col, v in zip(SEGMENT_COLUMNS, (dep, type_etab, age)):
+            if v is not None: self.values[col].add(v)
+        for key in _keys(*segment):
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = Stats()
+            cell._add(rows, count, total, total_sq)
+
+    def add_row(self, row):
+        """Ajout d'une ligne : agrégats mis à jour, valeurs insérées à leur place dans les distributions."""
+        vals = [_number(row.get(m)) for m in METRICS]
+        ok = [v is not None for v in vals]
+        segment = (row.get(VERSION_COLUMN) or LEGACY_RUBRIC,) + _segment(tuple(row.get(c) for c in SEGMENT_COLUMNS))
+        self._add(segment, 1,
+                  [int(o) for o in ok],
+                  [v if o else 0.0 for v, o in zip(vals, ok)],
+                  [v ** 2 if o else 0.0 for v, o in zip(vals, ok)])
+        for key in _peer_keys(*segment):
+            dist = self.dist.get(key)
+            if dist is None:
+                dist = self.dist[key] = [array("d") for _ in METRICS]
+            for a, v, o in zip(dist, vals, ok):
+                if o: insort(a, v)
+
+    def add_frame(self, df):
+        """Ajout en masse : un groupby puis une mise à jour par segment."""
+        import pandas as pd
+        if len(df) == 0:
+            return
+        df = df.reindex(columns=list(dict.fromkeys(SEGMENT_COLUMNS + METRICS + [VERSION_COLUMN])))
+        keys = pd.DataFrame({
+            "v": df[VERSION_COLUMN].fillna(LEGACY_RUBRIC),
+            **{c: df[c].astype(object).where(df[c].notna(), None) for c in SEGMENT_COLUMNS},
+        })
+        vals = df[METRICS].apply(pd.to_numeric, errors="coerce")
+        frame = pd.concat([keys, vals, (vals ** 2).add_suffix("_sq")], axis=1)
+        grouped = frame.groupby(list(keys.columns), dropna=False, sort=False)
+        rows = grouped.size()
+        count = grouped[METRICS].count()
+        total = grouped[METRICS].sum()
+        total_sq = grouped[[m + "_sq" for m in METRICS]].sum()
+        for seg in rows.index:
+            self._add(_segment(seg), int(rows[seg]), count.loc[seg].tolist(), total.loc[seg].tolist(), total_sq.loc[seg].tolist())
+        # distributions : valeurs regroupées par clé, puis une seule fusion triée par clé
+        arr = vals.to_numpy(dtype=float)
+        pending = {}
+        for seg, pos in grouped.indices.items():
+            block = arr[pos]
+            for key in _peer_keys(*_segment(seg)):
+                pending.setdefault(key, []).append(block)
+        self._merge(pending)
+
+    def _merge(self, pending):
+        import numpy as np
+        for key, blocks in pending.items():
+            block = np.concatenate(blocks)
+            dist = self.dist.setdefault(key, [array("d") for _ in METRICS])
+            for i, a in enumerate(dist):
+                col = block[:, i]
+                col = col[~np.isnan(col)]
+                if len(col):
+                    merged = array("d")
+                    merged.frombytes(np.sort(np.concatenate([np.frombuffer(a, dtype=float), col])).tobytes())
+                    dist[i] = merged
+
+    @timed("rollup.sync")
+    def sync(self):
+        """Intègre les lignes ajoutées au store depuis le dernier appel."""
+        import pandas as pd
+        with self._lock:
+            version = self.store.version()
+            if version == self._version:
+                return self
+            if self._version is not None and (version[0] != self._version[0] or version < self._version):
+                self._reset()
+            for rows in self._iter_new():
+                if len(rows) <= INSORT_MAX:
+                    for row in rows:
+                        self.add_row(row)
+                else:
+                    self.add_frame(pd.DataFrame.from_records(rows))
+            self._version = version
+        return self
+
+    def _iter_new(self, size=50_000):
+        while True:
+            rows, self._cursor = self.store.rows_since(self._cursor, limit=size)
+            if not rows:
+                return
+            yield rows
+
+    def query(self, version, dep=ALL, type_etab=ALL, age=ALL):
+        """Agrégat d'une combinaison de filtres (« Tous » = pas de filtre) ; None si vide."""
+        return self.cells.get((version, dep, type_etab, age))
+
+    def rank(self, version, dep, type_etab, age, scores, min_peers=MIN_PEERS):
+        """Rang de `scores` ({indicateur: valeur}) parmi les pairs du même segment.
+
+        Segment le plus fin de `PEER_LEVELS` comptant au moins `min_peers`
+        établissements (sinon le plus large disponible). Renvoie
+        `{"segment": (dep, type, age), "peers": n, "ranks": {indicateur: {...}}}`
+        avec pour chaque indicateur le rang percentile (ex aequo comptés pour
+        moitié), la position (1 = meilleur) et l'effectif ; None si aucune donnée.
+        """
+        with self._lock:   # pas de lecture pendant une fusion de sync()
+            found = None
+            for key in _peer_keys(version, dep, type_etab, age):
+                dist = self.dist.get(key)
+                if dist and len(dist[-1]):
+                    found = key, dist
+                    if len(dist[-1]) >= min_peers:
+                        break
+            if found is None:
+                return None
+            key, dist = found
+            ranks = {}
+            for metric, v in scores.items():
+                a = dist[METRICS.index(metric)]
+                if v is None or v != v or not len(a):
+                    continue
+                lo, hi = bisect_left(a, v), bisect_right(a, v)
+                ranks[metric] = {"percentile": 100 * (lo + (hi - lo) / 2) / len(a),
+                                 "position": len(a) - hi + 1, "peers": len(a)}
+            return {"segment": key[1:], "peers": len(dist[-1]), "ranks": ranks}
+
+    def options(self, column):
+        return sorted(self.values[column], key=str)
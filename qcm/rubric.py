@@ -0,0 +1,51 @@
+"""Barèmes versionnés.
+
+Chaque version décrit les pondérations et les seuils utilisés par
+`compute_indicators` / `compute_indicators_batch`. Une version publiée ne se
+modifie plus : pour changer le barème, ajouter une entrée et faire pointer
+CURRENT_RUBRIC dessus, puis recalculer les résultats (`python -m qcm.recompute`).
+"""
+
+RUBRICS = {
+    "v1": {
+        # Barème par domaines (pondérations qui totalisent 100)
+        "weights": {
+            "Referent": 20,           # référent + formation + organisme
+            "Regulier": 25,           # existence + part usagers + durée + variété
+            "Occasionnel": 10,        # existence
+            "Encadrement": 15,        # profils pro
+            "Projet": 10,             # inscrit au projet
+            "Liens": 10,              # partenaires
+            "Qualite": 10             # objectifs, satisfaction perçue
+        },
+        "referent": {"identifie": 0.6, "formation": 0.25, "organisme": 0.15},
+        "regulier": {
+            "base": 0.35,
+            "part": {"poids": 0.35, "min": 0.10, "max": 0.70},     # part d'usagers (0..1)
+            "duree": {"poids": 0.20, "min": 30, "max": 90},        # minutes / semaine
+            "diversite": {"poids": 0.10, "cible": 3},              # nb de types d'APS
+        },
+        "encadrement": {"base": 0.6, "bonus": 0.4, "cible": 2},
+        "liens": {"cible": 3},
+        "qualite": {
+            "objectifs": {"poids": 0.7, "cible": 5},
+            "penalite_insatisfaits": 0.25,
+            "penalite_vouloir_plus": 0.15,
+            "base": 0.45,
+        },
+    },
+}
+
+CURRENT_RUBRIC = "v1"
+
+# Version attribuée aux lignes enregistrées avant l'apparition de la colonne
+LEGACY_RUBRIC = "v1"
+
+VERSION_COLUMN = "Version_bareme"
+
+
+def get_rubric(version=None):
+    try:
+        return RUBRICS[version or CURRENT_RUBRIC]
+    except KeyError:
+        raise ValueError(f"Barème inconnu : {version!r} (disponibles : {', '.join(RUBRICS)})") from None
@@ -0,0 +1,117 @@
+"""Schéma typé du tableau des résultats (mémoire et temps de filtrage de la page Admin).
+
+Relus du store (ou d'un xlsx), tous les champs arrivent en `object` : une
+chaîne Python par cellule. `apply_schema` déclare les types :
+
+- champs à liste fixe du formulaire (Département, Type, Referent, Part_usagers…)
+  -> `category` dont les catégories sont les options de `OPTIONS` (codes int8) ;
+  une valeur hors liste (ancien classeur) est ajoutée en fin de catégories ;
+- texte libre répété (Etablissement, choix multiples joints, Source, version)
+  -> `category` aux catégories observées ;
+- indicateurs -> float32 ; masques de choix multiples -> int32 ;
+- Part_usagers et Duree_hebdo -> colonnes numériques `Part_usagers_pct` et
+  `Duree_min`, calculées une fois par catégorie ;
+- Horodatage -> datetime64 (laissé en texte si un format est inattendu).
+
+Un filtre `df[df["Type"] == "IME"]` compare alors des codes entiers.
+`concat` fusionne deux frames typés en unifiant les catégories.
+"""
+from qcm.multichoice import mask_column, masks
+from qcm.options import MULTI_FIELDS, OPTIONS
+from qcm.rubric import VERSION_COLUMN
+from qcm.scoring import ANSWER_COLUMNS, DOMAINS_ORDER, duree_to_minutes, pct_to_float
+
+# colonne -> options déclarées (ordre du formulaire)
+CATEGORIES = {ANSWER_COLUMNS[k]: OPTIONS[k] for k in (
+    "departement", "type_etab", "tranche_age", "referent", "formation_referent", "organisme",
+    "activite_reguliere", "nb_usagers", "duree", "freq_label", "occasionnelle", "projet_etab")}
+# texte répété sans liste fixe
+DYNAMIC_CATEGORIES = ["Etablissement", VERSION_COLUMN, "Source"] + [ANSWER_COLUMNS[k] for k in MULTI_FIELDS]
+FLOAT32 = [f"Indic_{d}" for d in DOMAINS_ORDER] + ["Indicateur_global", "Places", "Score_source_pct", "Classement_source",
+                                                    "Referent_APA_source", "Referent_educateur_source", "Referent_autre_source",
+                                                    "Bonus_CPOM_source", "Temps_quotidien_source"]
+# colonne numérique dérivée -> (colonne source, conversion d'une option)
+DERIVED = {
+    "Part_usagers_pct": ("Part_usagers", lambda v: round(pct_to_float(v) * 100, 1)),
+    "Duree_min": ("Duree_hebdo", duree_to_minutes),
+}
+
+
+def _categorical(col, declared=None):
+    import pandas as pd
+    values = col.astype(object).where(col.notna(), None)
+    known = list(declared or [])
+    seen = set(known)
+    extra = sorted({v for v in pd.unique(values) if v is not None and v not in seen}, key=str)
+    return pd.Categorical(values, categories=known + extra)
+
+
+def _parse(parse, value):
+    # valeur hors liste (ancien classeur) : pas de conversion numérique
+    try:
+        return parse(value)
+    except (AttributeError, TypeError, ValueError):
+        return float("nan")
+
+
+def _datetimes(s):
+    import pandas as pd
+    try:
+        return pd.to_datetime(s, format="ISO8601")
+    except (TypeError, ValueError):
+        return s  # format inattendu : colonne laissée en texte plutôt que des NaT
+
+
+def apply_schema(df):
+    """Copie de `df` aux types déclarés ; colonnes absentes ignorées, colonnes inconnues inchangées."""
+    import numpy as np
+    import pandas as pd
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORIES:
+            out[col] = pd.Series(_categorical(s, CATEGORIES[col]), index=df.index)
+        elif col in DYNAMIC_CATEGORIES:
+            out[col] = pd.Series(_categorical(s), index=df.index)
+        elif col in FLOAT32:
+            out[col] = pd.to_numeric(s, errors="coerce").astype("float32")
+        elif col == "Horodatage":
+            out[col] = _datetimes(s)
+        else:
+            out[col] = s
+    typed = pd.DataFrame(out, index=df.index)
+    for field in MULTI_FIELDS:
+        col = ANSWER_COLUMNS[field]
+        if col in df or mask_column(col) in df:
+            typed[mask_column(col)] = masks(df, field).astype("int32")
+    for name, (src, parse) in DERIVED.items():
+        if src in typed:
+            cat = typed[src].cat
+            table = np.array([_parse(parse, c) for c in cat.categories] + [np.nan], dtype="float32")
+            typed[name] = table[cat.codes.to_numpy()]   # code -1 (manquant) -> NaN
+    return typed
+
+
+def concat(a, b):
+    """Concatène deux frames typés ; les catégories sont unifiées (l'ordre déclaré est conservé)."""
+    import pandas as pd
+    if a is None or len(a.columns) == 0:
+        return b
+    a, b = a.copy(deep=False), b.copy(deep=False)
+    for x, y in ((a, b), (b, a)):
+        # colonne catégorielle absente d'un côté : catégorielle vide plutôt que object
+        for col in x.columns.difference(y.columns):
+            if isinstance(x[col].dtype, pd.CategoricalDtype):
+                y[col] = pd.Categorical([None] * len(y), categories=x[col].cat.categories)
+    for col in a.columns:
+        if isinstance(a[col].dtype, pd.CategoricalDtype) and isinstance(b[col].dtype, pd.CategoricalDtype):
+            cats = list(a[col].cat.categories)
+            seen = set(cats)
+            cats += [c for c in b[col].cat.categories if c not in seen]
+            a[col] = a[col].cat.set_categories(cats)
+            b[col] = b[col].cat.set_categories(cats)
+    return pd.concat([a, b], ignore_index=True)
+
+
+def bytes_per_row(df):
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
@@ -0,0 +1,360 @@
+"""Barème et calcul des indicateurs (une réponse ou un jeu de données entier).
+
+Module sans dépendance lourde (importé à chaque démarrage de l'app et par
+l'API) : pandas/NumPy ne sont importés que par `compute_indicators_batch`.
+"""
+from datetime import datetime
+
+from qcm.metrics import timed
+from qcm.multichoice import encode as encode_mask, mask_column
+from qcm.options import MULTI_FIELDS
+from qcm.rubric import CURRENT_RUBRIC, VERSION_COLUMN, get_rubric
+
+# Barème courant (voir qcm/rubric.py pour les versions)
+WEIGHTS = get_rubric()["weights"]
+DOMAINS_ORDER = ["Referent", "Regulier", "Occasionnel", "Encadrement", "Projet", "Liens", "Qualite"]
+# Champs du dict `answers` dont dépend chaque domaine (tenir à jour avec compute_indicators)
+DOMAIN_FIELDS = {
+    "Referent": ["referent", "formation_referent", "organisme"],
+    "Regulier": ["activite_reguliere", "nb_usagers", "duree", "types_activites"],
+    "Occasionnel": ["occasionnelle"],
+    "Encadrement": ["encadrants"],
+    "Projet": ["projet_etab"],
+    "Liens": ["liens"],
+    "Qualite": ["objectifs", "satisfaction"],
+}
+
+def scale(value, mini, maxi):
+    if value <= mini: return 0.0
+    if value >= maxi: return 1.0
+    return (value-mini)/(maxi-mini)
+
+def pct_to_float(pct_label):
+    # "30-40%" -> 0.35 ; "90-100%" -> 0.95
+    num = pct_label.split("%")[0]         # "30-40"
+    a,b = num.split("-")
+    return (float(a)+float(b))/200.0
+
+def duree_to_minutes(label):
+    m = {"0 min":0,"20 min":20,"30 min":30,"45 min":45,"1h":60,"1h30":90,"2h":120,"2h30":150}
+    return m.get(label,0)
+
+@timed("scoring.compute_indicators")
+def compute_indicators(data, version=None):
+    """Calcule les sous-indicateurs [0..100] par domaine puis l'indicateur global (pondéré).
+
+    `version` : clé de qcm.rubric.RUBRICS (barème courant par défaut).
+    """
+    rb = get_rubric(version)
+    subs = {}
+
+    # --- Référent (20)
+    r = rb["referent"]
+    sub_ref = 0
+    if data["referent"] == "Oui": sub_ref += r["identifie"]
+    if data["formation_referent"] == "Oui": sub_ref += r["formation"]
+    if data["organisme"] != "Aucun / Non précisé": sub_ref += r["organisme"]
+    subs["Referent"] = round(sub_ref*100,1)
+
+    # --- Régulier (25)
+    r = rb["regulier"]
+    sub_reg = 0
+    if data["activite_reguliere"] != "Non":
+        sub_reg += r["base"]
+        # part d'usagers : cible >= 50%
+        part = pct_to_float(data["nb_usagers"])  # 0..1
+        sub_reg += r["part"]["poids"] * scale(part, r["part"]["min"], r["part"]["max"])
+        # durée hebdo : cible >= 90 min
+        minutes = duree_to_minutes(data["duree"])
+        sub_reg += r["duree"]["poids"] * scale(minutes, r["duree"]["min"], r["duree"]["max"])
+        # diversité : au moins 2 types → meilleur
+        diversite = len(data["types_activites"])
+        sub_reg += r["diversite"]["poids"] * min(diversite/r["diversite"]["cible"], 1.0)
+    else:
+        sub_reg = 0
+    subs["Regulier"] = round(sub_reg*100,1)
+
+    # --- Occasionnel (10)
+    sub_occ = 1.0 if data["occasionnelle"] == "Oui" else 0.0
+    subs["Occasionnel"] = round(sub_occ*100,1)
+
+    # --- Encadrement (15)
+    # 1 pro = bien, 2 profils = mieux
+    r = rb["encadrement"]
+    enc = data["encadrants"]
+    if "Aucun professionnel" in enc or len(enc)==0:
+        sub_enc = 0
+    else:
+        base = r["base"]
+        bonus = r["bonus"] * min(len(enc)/r["cible"],1.0)
+        sub_enc = base + bonus
+    subs["Encadrement"] = round(sub_enc*100,1)
+
+    # --- Projet (10)
+    subs["Projet"] = 100.0 if data["projet_etab"]=="Oui" else 0.0
+
+    # --- Liens (10)
+    liens = data["liens"]
+    if "Aucun" in liens or len(liens)==0:
+        sub_liens = 0
+    else:
+        sub_liens = min(len(liens)/rb["liens"]["cible"],1.0)
+    subs["Liens"] = round(sub_liens*100,1)
+
+    # --- Qualité/intentions (10)
+    # objectifs : plus il y en a (pertinents), mieux c'est (max 5)
+    r = rb["qualite"]
+    obj = len(data["objectifs"])
+    sat = data["satisfaction"]
+    plus = "Vouloir plus d’APS" in sat
+    pas_satisfaits = "Ne pas être satisfaits" in sat
+    # base sur objectifs
+    s_obj = min(obj/r["objectifs"]["cible"], 1.0) * r["objectifs"]["poids"]
+    # perception : pénalité si insatisfaction
+    pen = 0.0
+    if pas_satisfaits: pen += r["penalite_insatisfaits"]
+    if plus: pen += r["penalite_vouloir_plus"]
+    sub_q = max(0.0, (s_obj - pen) + r["base"])  # petite base positive pour ne pas écraser
+    sub_q = min(1.0, sub_q)
+    subs["Qualite"] = round(sub_q*100,1)
+
+    return subs, global_indicator(subs, version)
+
+def global_indicator(subs, version=None):
+    """Indicateur global pondéré (poids du barème `version`) à partir des sous-indicateurs."""
+    total = 0.0
+    for d,w in get_rubric(version)["weights"].items():
+        total += (subs[d]/100.0) * w
+    return round(total,1)
+
+def recommandations(subs):
+    """Conseils par domaine selon sous-indicateurs."""
+    recos = []
+
+    def reco_for(domain, msg_low, msg_mid, msg_high):
+        s = subs[domain]
+        if s < 40: recos.append(f"🔴 **{domain}** — {msg_low}")
+        elif s < 70: recos.append(f"🟠 **{domain}** — {msg_mid}")
+        else: recos.append(f"🟢 **{domain}** — {msg_high}")
+
+    reco_for("Referent",
+             "Désigner un(e) référent(e) APS et prévoir une formation reconnue (LSAHF, Handisport, Université…).",
+             "Formaliser le rôle du référent et compléter/parfaire la formation.",
+             "Maintenir la dynamique (veille, mise à jour des compétences).")
+
+    reco_for("Regulier",
+             "Mettre en place des APS **hebdomadaires**, viser ≥ 50% des usagers et ≥ 90 min/sem, diversifier les pratiques.",
+             "Augmenter progressivement la **part d’usagers** et la **durée** (objectif 90 min/sem), varier 2–3 types d’APS.",
+             "Consolider les volumes et la diversité, formaliser la programmation annuelle.")
+
+    reco_for("Occasionnel",
+             "Introduire des temps **occasionnels** (sorties, événements, cycles courts) pour engager les publics.",
+             "Régulariser la fréquence (ex. mensuelle) et anticiper le calendrier.",
+             "Pérenniser un calendrier d’événements et mutualiser avec d’autres ESMS.")
+
+    reco_for("Encadrement",
+             "Mobiliser des **professionnels** (APA, éducateur sportif) et clarifier l’encadrement.",
+             "Augmenter les créneaux encadrés et favoriser la co-intervention (APA + éducateur).",
+             "Capitaliser (tutorat interne, partage de séances, transmission).")
+
+    reco_for("Projet",
+             "Inscrire les APS dans le **projet d’établissement/CPOM** avec objectifs, indicateurs, moyens.",
+             "Mieux formaliser dans le projet (indicateurs, calendrier, moyens).",
+             "Suivre des indicateurs annuels et communiquer aux équipes/financeurs.")
+
+    reco_for("Liens",
+             "Créer des liens avec clubs (adapté/ordinaire), ligues, MSS, communes pour l’accès aux créneaux.",
+             "Élargir et contractualiser (convention, accès infrastructures, co-organisation).",
+             "Structurer un réseau de partenaires et un planning partagé.")
+
+    reco_for("Qualite",
+             "Clarifier les **objectifs** (autonomie, bien-être, habiletés…) et travailler l’adhésion des usagers.",
+             "Mieux relier objectifs ↔ séances et recueillir le **ressenti** des usagers.",
+             "Poursuivre l’évaluation qualitative et la co-construction avec les usagers.")
+
+    return recos
+
+# Champs obligatoires (mêmes règles pour la barre de progression, la validation UI et l'API)
+REQUIRED_FIELDS = [
+    ("Nom de l’établissement", "nom"),
+    ("Nombre de places", "nb_places"),
+    ("Référent APS", "referent"),
+    ("Formation spécifique", "formation_referent"),
+    ("APS régulières", "activite_reguliere"),
+    ("Part d’usagers concernés", "nb_usagers"),
+    ("Durée hebdo moyenne", "duree"),
+    ("Encadrement", "encadrants"),
+    ("Projet d’établissement", "projet_etab"),
+    ("APS occasionnelles", "occasionnelle"),
+]
+
+def missing_required(answers):
+    """Libellés des champs obligatoires non renseignés (None, vide ou 0 place)."""
+    missing = []
+    for label, key in REQUIRED_FIELDS:
+        v = answers.get(key)
+        if v is None or (key in ("nom", "nb_places", "encadrants") and not v):
+            missing.append(label)
+    return missing
+
+# --- Calcul de progression de formulaire (pour la barre en haut)
+def compute_form_progress(nom, nb_places, referent, formation_referent, activite_reguliere, nb_usagers, duree, encadrants, projet_etab, occasionnelle):
+    # On aligne la logique sur la validation (mêmes champs requis)
+    answers = dict(nom=nom, nb_places=nb_places, referent=referent, formation_referent=formation_referent,
+                   activite_reguliere=activite_reguliere, nb_usagers=nb_usagers, duree=duree,
+                   encadrants=encadrants, projet_etab=projet_etab, occasionnelle=occasionnelle)
+    required_total = len(REQUIRED_FIELDS)
+    done = required_total - len(missing_required(answers))
+    pct = int(round((done/required_total)*100)) if required_total>0 else 0
+    return pct, done, required_total
+
+# Correspondance clés `answers` -> colonnes enregistrées (ordre du fichier de résultats)
+ANSWER_COLUMNS = {
+    "nom": "Etablissement", "departement": "Département", "type_etab": "Type",
+    "tranche_age": "Tranche_age", "nb_places": "Places", "public": "Public",
+    "handicaps": "Handicaps",
+    "referent": "Referent", "formation_referent": "Formation", "organisme": "Organisme",
+    "activite_reguliere": "Regulier", "nb_usagers": "Part_usagers", "duree": "Duree_hebdo",
+    "types_activites": "Types_reguliers", "freq_label": "Frequence",
+    "occasionnelle": "Occasionnel",
+    "objectifs": "Objectifs", "satisfaction": "Satisfaction",
+    "encadrants": "Encadrants", "infrastructures": "Infrastructures",
+    "projet_etab": "Projet", "liens": "Liens",
+    "actions_existantes": "Actions", "freins": "Freins",
+}
+
+def answers_to_row(answers, horodatage=None):
+    """Ligne de résultats (sans indicateurs) : listes jointes par ";" et masques de bits (qcm.multichoice)."""
+    row = {"Horodatage": horodatage or datetime.now().isoformat(timespec='seconds')}
+    for key, col in ANSWER_COLUMNS.items():
+        v = answers.get(key)
+        row[col] = ";".join(v) if isinstance(v, (list, tuple)) else v
+    for key in MULTI_FIELDS:
+        row[mask_column(ANSWER_COLUMNS[key])] = encode_mask(key, answers.get(key))
+    return row
+
+def result_row(answers, subs, indicateur_global, version=None, horodatage=None):
+    """Ligne complète à enregistrer : réponses, indicateurs et version du barème."""
+    return {
+        **answers_to_row(answers, horodatage),
+        **{f"Indic_{k}": v for k,v in subs.items()},
+        "Indicateur_global": indicateur_global,
+        VERSION_COLUMN: version or CURRENT_RUBRIC,
+    }
+
+def row_to_answers(row):
+    """Inverse de `answers_to_row` : ligne enregistrée -> dict `answers`."""
+    answers = {}
+    for key, col in ANSWER_COLUMNS.items():
+        v = row.get(col)
+        answers[key] = _split(v) if key in MULTI_FIELDS else v
+    return answers
+
+# =========================
+# CALCUL EN LOT (colonnes)
+# =========================
+
+def _split(value):
+    # cellule multi-choix enregistrée -> liste ("" / NaN -> [])
+    if not isinstance(value, str) or value == "":
+        return []
+    return value.split(";")
+
+def _per_value(col, func):
+    """Applique `func` une fois par valeur distincte puis diffuse par codes (factorize)."""
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(col)
+    table = np.array([func(u) for u in uniques] + [func(None)], dtype=float)
+    return table[codes]  # code -1 (manquant) -> dernière case
+
+def _round1(values):
+    """`round(x, 1)` Python (arrondi de la valeur binaire exacte) appliqué par valeur distincte.
+
+    np.round arrondit x*10 et diffère sur les demi-dixièmes (51.55 -> 51.6 au lieu de 51.5).
+    """
+    import numpy as np
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return np.array([round(float(v), 1) for v in uniques])[inverse]
+
+@timed("scoring.compute_indicators_batch")
+def compute_indicators_batch(df, version=None):
+    """Version vectorisée de `compute_indicators` sur un DataFrame au format des résultats.
+
+    Colonnes utilisées : Referent, Formation, Organisme, Regulier, Part_usagers,
+    Duree_hebdo, Types_reguliers, Occasionnel, Encadrants, Projet, Liens,
+    Objectifs, Satisfaction (multi-choix joints par ";").
+    Renvoie un DataFrame Indic_* + Indicateur_global aligné sur `df.index`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rb = get_rubric(version)
+
+    def flag(col, target):
+        return _per_value(df[col], lambda v: v == target)
+
+    def count(col):
+        return _per_value(df[col], lambda v: len(_split(v)))
+
+    def has(col, item):
+        return _per_value(df[col], lambda v: item in _split(v))
+
+    def vscale(value, mini, maxi):
+        return np.clip((value - mini) / (maxi - mini), 0.0, 1.0)
+
+    n = len(df)
+    subs = {}
+
+    # --- Référent
+    r = rb["referent"]
+    sub_ref = np.zeros(n)
+    sub_ref = sub_ref + np.where(flag("Referent", "Oui") > 0, r["identifie"], 0.0)
+    sub_ref = sub_ref + np.where(flag("Formation", "Oui") > 0, r["formation"], 0.0)
+    sub_ref = sub_ref + np.where(_per_value(df["Organisme"], lambda v: v != "Aucun / Non précisé") > 0, r["organisme"], 0.0)
+    subs["Referent"] = sub_ref
+
+    # --- Régulier
+    r = rb["regulier"]
+    actif = flag("Regulier", "Non") == 0
+    part = _per_value(df["Part_usagers"], lambda v: pct_to_float(v) if isinstance(v, str) else 0.0)
+    minutes = _per_value(df["Duree_hebdo"], duree_to_minutes)
+    sub_reg = np.full(n, float(r["base"]))
+    sub_reg = sub_reg + r["part"]["poids"] * vscale(part, r["part"]["min"], r["part"]["max"])
+    sub_reg = sub_reg + r["duree"]["poids"] * vscale(minutes, r["duree"]["min"], r["duree"]["max"])
+    sub_reg = sub_reg + r["diversite"]["poids"] * np.minimum(count("Types_reguliers") / r["diversite"]["cible"], 1.0)
+    subs["Regulier"] = np.where(actif, sub_reg, 0.0)
+
+    # --- Occasionnel
+    subs["Occasionnel"] = np.where(flag("Occasionnel", "Oui") > 0, 1.0, 0.0)
+
+    # --- Encadrement
+    r = rb["encadrement"]
+    n_enc = count("Encadrants")
+    sans_enc = (has("Encadrants", "Aucun professionnel") > 0) | (n_enc == 0)
+    subs["Encadrement"] = np.where(sans_enc, 0.0, r["base"] + r["bonus"] * np.minimum(n_enc / r["cible"], 1.0))
+
+    # --- Projet
+    subs["Projet"] = np.where(flag("Projet", "Oui") > 0, 1.0, 0.0)
+
+    # --- Liens
+    n_liens = count("Liens")
+    sans_liens = (has("Liens", "Aucun") > 0) | (n_liens == 0)
+    subs["Liens"] = np.where(sans_liens, 0.0, np.minimum(n_liens / rb["liens"]["cible"], 1.0))
+
+    # --- Qualité
+    r = rb["qualite"]
+    s_obj = np.minimum(count("Objectifs") / r["objectifs"]["cible"], 1.0) * r["objectifs"]["poids"]
+    pen = np.zeros(n)
+    pen = pen + np.where(has("Satisfaction", "Ne pas être satisfaits") > 0, r["penalite_insatisfaits"], 0.0)
+    pen = pen + np.where(has("Satisfaction", "Vouloir plus d’APS") > 0, r["penalite_vouloir_plus"], 0.0)
+    subs["Qualite"] = np.minimum(1.0, np.maximum(0.0, (s_obj - pen) + r["base"]))
+
+    out = pd.DataFrame({f"Indic_{d}": _round1(subs[d] * 100) for d in DOMAINS_ORDER}, index=df.index)
+
+    # ---- Indicateur global pondéré
+    total = np.zeros(n)
+    for d, w in rb["weights"].items():
+        total = total + (out[f"Indic_{d}"].to_numpy() / 100.0) * w
+    out["Indicateur_global"] = _round1(total)
+    return out
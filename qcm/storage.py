@@ -0,0 +1,238 @@
+"""Stockage des résultats du QCM.
+
+La source de vérité est un journal en ajout seul (SQLite en mode WAL par défaut,
+ou un fichier JSONL) : une soumission coûte une écriture, quel que soit le nombre
+de lignes déjà enregistrées, et plusieurs sessions peuvent écrire en même temps.
+L'export Excel est généré à la demande à partir du store.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+
+from qcm.metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows : l'ouverture en O_APPEND suffit pour des lignes courtes
+    fcntl = None
+
+DEFAULT_STORE = os.environ.get("QCM_RESULTS_STORE", "resultats_qcm.sqlite")
+LEGACY_XLSX = "resultats_qcm.xlsx"
+
+
+def _clean(value):
+    # NaN (cellules vides d'un xlsx) -> None ; types numpy -> types Python
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _dumps(row):
+    return json.dumps({k: _clean(v) for k, v in row.items()}, ensure_ascii=False, default=str)
+
+
+class ResultsStore:
+    """Interface commune des backends de stockage.
+
+    Chaque backend expose un curseur opaque (`rows_since`) et une `version()`
+    peu coûteuse, ce qui permet de relire uniquement les lignes ajoutées.
+    """
+
+    path = None
+
+    def append(self, row):
+        self.append_many([row])
+
+    def append_many(self, rows):
+        raise NotImplementedError
+
+    def rows_since(self, cursor=None, limit=None):
+        """Renvoie (lignes ajoutées après `cursor`, au plus `limit`, nouveau curseur)."""
+        raise NotImplementedError
+
+    def iter_chunks(self, size=50_000):
+        """Parcourt le store par paquets de `size` lignes (mémoire bornée)."""
+        cursor = None
+        while True:
+            rows, cursor = self.rows_since(cursor, limit=size)
+            if not rows:
+                return
+            yield rows
+
+    def version(self):
+        raise NotImplementedError
+
+    def has_value(self, column, value):
+        """Vrai si une ligne enregistrée a `value` dans `column` (ex. classeur déjà importé)."""
+        return any(r.get(column) == value for rows in self.iter_chunks() for r in rows)
+
+    def is_empty(self):
+        return not self.rows_since(None, limit=1)[0]
+
+    def to_frame(self):
+        import pandas as pd
+        rows, _ = self.rows_since(None)
+        return pd.DataFrame.from_records(rows)
+
+    @timed("store.import_xlsx")
+    def import_xlsx(self, path):
+        """Reprise d'un ancien resultats_qcm.xlsx ; renvoie le nombre de lignes importées."""
+        import pandas as pd
+        df = pd.read_excel(path)
+        rows = df.to_dict("records")
+        self.append_many(rows)
+        return len(rows)
+
+
+class SQLiteStore(ResultsStore):
+    """Table en ajout seul, une ligne JSON par soumission."""
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " horodatage TEXT,"
+            " etablissement TEXT,"
+            " data TEXT NOT NULL)"
+        )
+
+    def _conn(self):
+        # une connexion par thread (Streamlit exécute chaque session dans son thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @timed("store.append")
+    def append_many(self, rows):
+        payload = [(r.get("Horodatage"), r.get("Etablissement"), _dumps(r)) for r in rows]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT INTO results (horodatage, etablissement, data) VALUES (?,?,?)", payload)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rows_since(self, cursor=None, limit=None):
+        last_id = cursor or 0
+        cur = self._conn().execute("SELECT id, data FROM results WHERE id > ? ORDER BY id LIMIT ?",
+                                   (last_id, -1 if limit is None else limit))
+        rows = []
+        for row_id, data in cur:
+            rows.append(json.loads(data))
+            last_id = row_id
+        return rows, last_id
+
+    def has_value(self, column, value):
+        (found,) = self._conn().execute(
+            "SELECT EXISTS (SELECT 1 FROM results WHERE json_extract(data, ?) = ?)", (f'$."{column}"', value)).fetchone()
+        return bool(found)
+
+    def version(self):
+        # (inode, dernier id) : change à chaque ajout ou si la base est recréée
+        (max_id,) = self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()
+        return (os.stat(self.path).st_ino, max_id)
+
+
+class JsonlStore(ResultsStore):
+    """Journal texte : une ligne JSON par soumission, écrite en O_APPEND."""
+
+    def __init__(self, path):
+        self.path = path
+        open(self.path, "a", encoding="utf-8").close()
+
+    @timed("store.append")
+    def append_many(self, rows):
+        data = "".join(_dumps(r) + "\n" for r in rows).encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl: fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def rows_since(self, cursor=None, limit=None):
+        offset = cursor or 0
+        rows = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # ligne en cours d'écriture par une autre session
+                rows.append(json.loads(line))
+                offset += len(line)
+                if limit is not None and len(rows) >= limit:
+                    break
+        return rows, offset
+
+    def version(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_size)
+
+
+class ResultsCache:
+    """DataFrame des résultats gardé en mémoire et rafraîchi par incréments.
+
+    `frame()` ne relit que les lignes ajoutées depuis le dernier appel ; la base
+    n'est relue entièrement que si elle a été recréée. `max_rows` borne la
+    mémoire en ne gardant que les lignes les plus récentes (`truncated` : nombre
+    de lignes écartées, à signaler à l'utilisateur) ; `typed` applique le schéma
+    déclaré de qcm.schema (catégories, float32) à chaque paquet lu.
+    """
+
+    def __init__(self, store, max_rows=None, typed=False):
+        self.store = store
+        self.max_rows = max_rows
+        self.typed = typed
+        self._lock = threading.Lock()
+        self._frame = None
+        self._cursor = None
+        self._version = None
+        self.total_rows = 0
+
+    @property
+    def truncated(self):
+        """Lignes du store absentes de `frame()` à cause de `max_rows`."""
+        return self.total_rows - (len(self._frame) if self._frame is not None else 0)
+
+    @timed("admin.results_frame")
+    def frame(self):
+        import pandas as pd
+        with self._lock:
+            version = self.store.version()
+            if self._frame is not None and version == self._version:
+                return self._frame
+            if self._version is None or version[0] != self._version[0] or version < self._version:
+                # base recréée : on repart de zéro
+                self._frame, self._cursor, self.total_rows = None, None, 0
+            rows, self._cursor = self.store.rows_since(self._cursor)
+            self.total_rows += len(rows)
+            if rows or self._frame is None:
+                new = pd.DataFrame.from_records(rows)
+                if self.typed:
+                    from qcm.schema import apply_schema, concat
+                    self._frame = concat(self._frame, apply_schema(new))
+                else:
+                    self._frame = new if self._frame is None else pd.concat([self._frame, new], ignore_index=True)
+                if self.max_rows and len(self._frame) > self.max_rows:
+                    self._frame = self._frame.iloc[-self.max_rows:].reset_index(drop=True)
+            self._version = version
+            return self._frame
+
+
+def open_store(path=DEFAULT_STORE):
+    """Choisit le backend d'après l'extension (.jsonl sinon SQLite)."""
+    if str(path).endswith(".jsonl"):
+        return JsonlStore(path)
+    return SQLiteStore(path)
@@ -0,0 +1,88 @@
+"""Non-régression de l'API de notation (sans store, sans réseau)."""
+import asyncio
+import json
+
+from qcm.api import ScoringServer
+
+MINIMAL = {
+    "nom": "ESAT Test", "nb_places": 40, "referent": "Oui", "formation_referent": "Non",
+    "activite_reguliere": "Oui, 1 fois par semaine", "nb_usagers": "40-50%", "duree": "1h",
+    "encadrants": ["Éducateur sportif"], "projet_etab": "Oui", "occasionnelle": "Non",
+}
+
+
+def _score(payload):
+    server = ScoringServer(None)
+    return asyncio.run(server.dispatch("POST", "/score?persist=0", json.dumps(payload).encode()))
+
+
+def test_minimal_required_payload_is_scored():
+    status, body = _score(MINIMAL)
+    assert status == 200, body
+    assert 0 <= body["indicateur_global"] <= 100
+
+
+def test_batch_with_minimal_item_keeps_valid_items():
+    status, body = _score([MINIMAL, {**MINIMAL, "organisme": "LSAHF"}, {"nom": "incomplet"}])
+    assert status == 200
+    assert [("errors" in r) for r in body["results"]] == [False, False, True]
+
+
+def test_batch_without_store_reports_nothing_saved():
+    status, body = asyncio.run(ScoringServer(None).dispatch("POST", "/score", json.dumps([MINIMAL, MINIMAL]).encode()))
+    assert status == 200
+    assert body["enregistres"] == 0
+
+
+def test_non_text_name_is_rejected():
+    status, body = _score({**MINIMAL, "nom": 12})
+    assert status == 422
+    assert any(e.startswith("nom") for e in body["errors"])
+
+
+def test_persisted_score_without_serve(tmp_path):
+    from qcm.storage import open_store
+    store = open_store(str(tmp_path / "r.sqlite"))
+    server = ScoringServer(store)
+    request = server.dispatch("POST", "/score", json.dumps(MINIMAL).encode())
+    status, _ = asyncio.run(asyncio.wait_for(request, timeout=5))
+    assert status == 200
+    assert not store.is_empty()
+
+
+def _raw(request):
+    async def run():
+        server = await asyncio.start_server(ScoringServer(None).handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            return status_line
+    return asyncio.run(run())
+
+
+def test_invalid_content_length_is_rejected():
+    assert _raw(b"POST /score HTTP/1.1\r\nContent-Length: abc\r\n\r\n").startswith(b"HTTP/1.1 400")
+
+
+def test_empty_filtered_csv_export_has_header(tmp_path):
+    from qcm.storage import open_store
+    store = open_store(str(tmp_path / "r.sqlite"))
+    store.append({"Etablissement": "ESAT Test", "Type": "ESAT", "Indicateur_global": 50.0})
+    request = b"GET /export.csv?type=IME HTTP/1.1\r\nConnection: close\r\n\r\n"
+
+    async def run():
+        server = await asyncio.start_server(ScoringServer(store).handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(request)
+            await writer.drain()
+            data = await reader.read()
+            writer.close()
+            return data
+    data = asyncio.run(run())
+    assert data.startswith(b"HTTP/1.1 200")
+    assert b"Etablissement" in data.split(b"\r\n\r\n", 1)[1]
@@ -0,0 +1,14 @@
+"""Recalcul hors ligne (qcm.recompute) sur des lignes incomplètes."""
+from qcm.recompute import recompute
+from qcm.rubric import VERSION_COLUMN
+from qcm.storage import open_store
+
+
+def test_partial_rows_are_recomputed(tmp_path):
+    src = open_store(str(tmp_path / "src.sqlite"))
+    src.append({"Etablissement": "ESAT Test", "Referent": "Oui"})
+    dst = open_store(str(tmp_path / "dst.sqlite"))
+    assert recompute(src, dst) == 1
+    (row,), _ = dst.rows_since(None)
+    assert row["Indicateur_global"] is not None
+    assert row[VERSION_COLUMN]
@@ -0,0 +1,13 @@
+"""Parité du calcul en lot (`compute_indicators_batch`) avec le calcul unitaire, sur toutes les combinaisons."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_scoring import parity_mismatches
+
+
+def test_batch_matches_single_scoring_exhaustively():
+    n, mismatches = parity_mismatches()
+    assert n == 11_940
+    assert mismatches == [], mismatches[:5]